@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+import statistics
+import time
+
+import cv2
+
+from benchmarks.run_benchmarks import build_environment
+from benchmarks.synthetic_video import ensure_synthetic_video
+from config.settings import DEFAULT_BENCHMARK_DIR, DEFAULT_KEYFRAME_INTERVAL
+from pipeline.engine import read_frames
+
+DECODE_STRATEGIES = ("read", "grab", "seek")
+
+
+def decode_video(video_path, frame_step, strategy, keyframe_interval):
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise RuntimeError(f"Failed to open video: {video_path}")
+    checksums = []
+    started_at = time.perf_counter()
+    try:
+        for item in read_frames(
+            capture,
+            frame_step=frame_step,
+            skip_decode=True,
+            decode_strategy=strategy,
+            keyframe_interval=keyframe_interval,
+        ):
+            checksums.append(int(item["frame"][::16, ::16].sum()))
+    finally:
+        capture.release()
+    return time.perf_counter() - started_at, checksums
+
+
+def run_decode_benchmark(
+    video_path,
+    frame_steps,
+    strategies=DECODE_STRATEGIES,
+    keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+    repeats=3,
+):
+    capture = cv2.VideoCapture(video_path)
+    total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    capture.release()
+    results = {}
+    for frame_step in frame_steps:
+        reference = None
+        for strategy in strategies:
+            runs = [
+                decode_video(video_path, frame_step, strategy, keyframe_interval)
+                for _ in range(max(1, repeats))
+            ]
+            elapsed = statistics.median(seconds for seconds, _ in runs)
+            checksums = runs[0][1]
+            if reference is None:
+                reference = {"elapsed": elapsed, "checksums": checksums}
+            key = f"step={frame_step}|{strategy}"
+            results[key] = {
+                "frame_step": frame_step,
+                "strategy": strategy,
+                "elapsed_seconds": elapsed,
+                "video_fps": total_frames / elapsed if elapsed else 0.0,
+                "analyzed_frames": len(checksums),
+                "speedup": reference["elapsed"] / elapsed if elapsed else 0.0,
+                "matches_reference": checksums == reference["checksums"],
+            }
+            print(
+                f"{key}: {results[key]['video_fps']:.1f} video fps, "
+                f"x{results[key]['speedup']:.2f}"
+                + ("" if results[key]["matches_reference"] else " (frames differ)")
+            )
+    return results
+
+
+def build_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output-dir", default=DEFAULT_BENCHMARK_DIR)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--video", default=None)
+    parser.add_argument(
+        "--frame-steps", nargs="+", type=int, default=[1, 2, 5, 10, 30]
+    )
+    parser.add_argument(
+        "--strategies",
+        nargs="+",
+        choices=DECODE_STRATEGIES,
+        default=list(DECODE_STRATEGIES),
+    )
+    parser.add_argument("--keyframe-interval", type=int, default=None)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--fps", type=int, default=25)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    video_path = args.video or ensure_synthetic_video(
+        os.path.join(args.output_dir, "videos"),
+        width=args.width,
+        height=args.height,
+        frames=args.frames,
+        fps=args.fps,
+    )
+    keyframe_interval = args.keyframe_interval or DEFAULT_KEYFRAME_INTERVAL
+    strategies = ["read"] + [name for name in args.strategies if name != "read"]
+    results = run_decode_benchmark(
+        video_path,
+        args.frame_steps,
+        strategies=strategies,
+        keyframe_interval=keyframe_interval,
+        repeats=args.repeats,
+    )
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": build_environment(),
+        "video": video_path,
+        "keyframe_interval": keyframe_interval,
+        "repeats": args.repeats,
+        "results": results,
+    }
+    output_path = args.output or os.path.join(
+        args.output_dir, f"decode_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"Results written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from benchmarks.synthetic_video import ensure_synthetic_video
+from config.settings import DEFAULT_BENCHMARK_DIR, DEFAULT_PROFILE_FILE
+
+PIPELINE_NAMES = ("faces", "emotions", "full")
+
+
+def parse_width(value):
+    return None if value.lower() in ("none", "0") else int(value)
+
+
+def build_cases(
+    pipelines, frame_steps, resize_widths, face_models, detection_strategies=("full",)
+):
+    grid = itertools.product(
+        pipelines, frame_steps, resize_widths, face_models, detection_strategies
+    )
+    return [
+        {
+            "pipeline": pipeline,
+            "frame_step": frame_step,
+            "resize_width": resize_width,
+            "face_model": face_model,
+            "detection_strategy": strategy,
+        }
+        for pipeline, frame_step, resize_width, face_model, strategy in grid
+    ]
+
+
+def case_key(case):
+    strategy = case.get("detection_strategy", "full")
+    return (
+        f"{case['pipeline']}|step={case['frame_step']}"
+        f"|width={case['resize_width'] or 'native'}|model={case['face_model']}"
+        + (f"|detect={strategy}" if strategy != "full" else "")
+    )
+
+
+def peak_memory_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / (1024.0 * 1024.0)
+    return peak / 1024.0
+
+
+def run_case(case, video_path, output_dir, options):
+    from pipeline.run_emotion_analysis import run_emotion_analysis
+    from pipeline.run_face_recognition import run_face_recognition
+    from pipeline.run_full_analysis import run_full_analysis
+
+    pipelines = {
+        "faces": run_face_recognition,
+        "emotions": run_emotion_analysis,
+        "full": run_full_analysis,
+    }
+    stats = pipelines[case["pipeline"]](
+        video_path,
+        output_dir=output_dir,
+        frame_step=case["frame_step"],
+        resize_width=case["resize_width"],
+        face_model=case["face_model"],
+        detection_strategy=case.get("detection_strategy", "full"),
+        profile=True,
+        **options,
+    )
+    profile_path = os.path.join(output_dir, DEFAULT_PROFILE_FILE)
+    with open(profile_path, "r", encoding="utf-8") as handle:
+        report = json.load(handle)
+    return {
+        "fps": stats["fps"],
+        "elapsed_seconds": stats["elapsed_seconds"],
+        "frames_processed": stats["frames_processed"],
+        "faces_detected": stats["summary"]["faces_detected"],
+        "peak_memory_mb": peak_memory_mb(),
+        "stages": {
+            name: {
+                "mean_ms": stage.get("mean_ms", 0.0),
+                "p95_ms": stage.get("p95_ms", 0.0),
+                "share": stage["share"],
+            }
+            for name, stage in report["stages"].items()
+        },
+    }
+
+
+def run_isolated(case, video_path, output_dir, options):
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        return executor.submit(run_case, case, video_path, output_dir, options).result()
+
+
+def combine_runs(runs):
+    stage_names = sorted({name for run in runs for name in run["stages"]})
+    return {
+        "fps": statistics.median(run["fps"] for run in runs),
+        "fps_runs": [run["fps"] for run in runs],
+        "elapsed_seconds": statistics.median(run["elapsed_seconds"] for run in runs),
+        "frames_processed": runs[0]["frames_processed"],
+        "faces_detected": runs[0]["faces_detected"],
+        "peak_memory_mb": max(run["peak_memory_mb"] for run in runs),
+        "stages": {
+            name: {
+                key: statistics.median(
+                    run["stages"][name][key] for run in runs if name in run["stages"]
+                )
+                for key in ("mean_ms", "p95_ms", "share")
+            }
+            for name in stage_names
+        },
+    }
+
+
+def build_environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+    }
+
+
+def run_benchmarks(
+    cases,
+    output_dir=DEFAULT_BENCHMARK_DIR,
+    repeats=1,
+    video_options=None,
+    pipeline_options=None,
+    video_path=None,
+):
+    video_options = video_options or {}
+    pipeline_options = pipeline_options or {}
+    if video_path is None:
+        video_path = ensure_synthetic_video(
+            os.path.join(output_dir, "videos"), **video_options
+        )
+    else:
+        video_options = {}
+    results = {}
+    for case in cases:
+        key = case_key(case)
+        case_name = key.replace("|", "_").replace("=", "-")
+        case_dir = os.path.join(output_dir, "runs", case_name)
+        runs = [
+            run_isolated(case, video_path, case_dir, pipeline_options)
+            for _ in range(max(1, repeats))
+        ]
+        result = dict(case, **combine_runs(runs))
+        results[key] = result
+        print(
+            f"{key}: {result['fps']:.2f} fps, {result['faces_detected']} faces, "
+            f"{result['peak_memory_mb']:.0f} MB"
+        )
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": build_environment(),
+        "video": dict(video_options, path=video_path),
+        "pipeline_options": pipeline_options,
+        "repeats": repeats,
+        "results": results,
+    }
+
+
+def compare_results(baseline, current, tolerance=0.1):
+    regressions = []
+    for key, result in current["results"].items():
+        previous = baseline["results"].get(key)
+        if previous is None or not previous["fps"]:
+            continue
+        change = (result["fps"] - previous["fps"]) / previous["fps"]
+        print(
+            f"{key}: {previous['fps']:.2f} -> {result['fps']:.2f} fps ({change:+.1%})"
+        )
+        if change < -tolerance:
+            regressions.append(
+                {
+                    "case": key,
+                    "baseline_fps": previous["fps"],
+                    "fps": result["fps"],
+                    "change": change,
+                }
+            )
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output-dir", default=DEFAULT_BENCHMARK_DIR)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument(
+        "--pipelines", nargs="+", choices=PIPELINE_NAMES, default=list(PIPELINE_NAMES)
+    )
+    parser.add_argument("--frame-steps", nargs="+", type=int, default=[1, 3])
+    parser.add_argument(
+        "--resize-widths", nargs="+", type=parse_width, default=[None, 480]
+    )
+    parser.add_argument(
+        "--face-models",
+        nargs="+",
+        choices=["hog", "cnn", "haar", "mediapipe"],
+        default=["hog"],
+    )
+    parser.add_argument(
+        "--detection-strategies", nargs="+", choices=["full", "roi"], default=["full"]
+    )
+    parser.add_argument("--video", default=None)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--frames", type=int, default=150)
+    parser.add_argument("--fps", type=int, default=25)
+    parser.add_argument("--faces", type=int, default=2)
+    parser.add_argument("--motion", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pipeline-mode", choices=["serial", "threaded"], default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    cases = build_cases(
+        args.pipelines,
+        args.frame_steps,
+        args.resize_widths,
+        args.face_models,
+        args.detection_strategies,
+    )
+    report = run_benchmarks(
+        cases,
+        output_dir=args.output_dir,
+        repeats=args.repeats,
+        video_options={
+            "width": args.width,
+            "height": args.height,
+            "frames": args.frames,
+            "fps": args.fps,
+            "faces": args.faces,
+            "motion": args.motion,
+            "seed": args.seed,
+        },
+        pipeline_options={
+            "pipeline_mode": args.pipeline_mode,
+            "workers": args.workers,
+        },
+        video_path=args.video,
+    )
+    output_path = args.output or os.path.join(
+        args.output_dir, f"results_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    with open(output_path, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"Results written to {output_path}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        regressions = compare_results(baseline, report, tolerance=args.tolerance)
+        if regressions:
+            print(json.dumps({"regressions": regressions}, indent=2))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import os
+
+import cv2
+import numpy as np
+
+SKIN_TONES = ((141, 180, 224), (105, 145, 198), (80, 110, 160), (170, 200, 235))
+
+
+def synthetic_video_name(width, height, frames, faces, motion, seed):
+    return f"synthetic_{width}x{height}_{frames}f_{faces}faces_m{motion:g}_s{seed}.mp4"
+
+
+def draw_face_patch(frame, center_x, center_y, size, tone):
+    axes = (size // 2, int(size * 0.62))
+    cv2.ellipse(frame, (center_x, center_y), axes, 0, 0, 360, tone, -1)
+    eye_y = center_y - size // 6
+    eye_offset = size // 5
+    eye_size = max(2, size // 12)
+    for eye_x in (center_x - eye_offset, center_x + eye_offset):
+        cv2.circle(frame, (eye_x, eye_y), eye_size, (40, 40, 40), -1)
+    cv2.line(
+        frame,
+        (center_x - size // 8, center_y + size // 8),
+        (center_x + size // 8, center_y + size // 8),
+        (60, 60, 110),
+        max(1, size // 20),
+    )
+    cv2.ellipse(
+        frame,
+        (center_x, center_y + size // 4),
+        (size // 5, size // 12),
+        0,
+        0,
+        180,
+        (50, 50, 120),
+        max(1, size // 24),
+    )
+
+
+def create_face_patches(rng, width, height, faces, motion):
+    patches = []
+    for index in range(faces):
+        size = int(rng.integers(max(24, height // 6), max(25, height // 3)))
+        speed = motion * float(rng.uniform(1.0, 4.0))
+        angle = float(rng.uniform(0.0, 2.0 * np.pi))
+        patches.append(
+            {
+                "x": float(rng.uniform(size, max(size + 1, width - size))),
+                "y": float(rng.uniform(size, max(size + 1, height - size))),
+                "dx": speed * np.cos(angle),
+                "dy": speed * np.sin(angle),
+                "size": size,
+                "tone": SKIN_TONES[index % len(SKIN_TONES)],
+            }
+        )
+    return patches
+
+
+def move_patch(patch, width, height):
+    margin = patch["size"] * 0.7
+    patch["x"] += patch["dx"]
+    patch["y"] += patch["dy"]
+    if not margin <= patch["x"] <= width - margin:
+        patch["dx"] = -patch["dx"]
+        patch["x"] = min(max(patch["x"], margin), width - margin)
+    if not margin <= patch["y"] <= height - margin:
+        patch["dy"] = -patch["dy"]
+        patch["y"] = min(max(patch["y"], margin), height - margin)
+
+
+def generate_synthetic_video(
+    output_path,
+    width=640,
+    height=360,
+    frames=150,
+    fps=25,
+    faces=2,
+    motion=1.0,
+    seed=0,
+):
+    rng = np.random.default_rng(seed)
+    background = cv2.GaussianBlur(
+        rng.integers(30, 90, (height, width, 3), dtype=np.uint8), (0, 0), 7
+    )
+    patches = create_face_patches(rng, width, height, faces, motion)
+    noise_level = int(round(4 * motion))
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    writer = cv2.VideoWriter(
+        output_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height)
+    )
+    if not writer.isOpened():
+        raise RuntimeError(f"Failed to open video writer: {output_path}")
+    try:
+        for _ in range(frames):
+            frame = background.copy()
+            if noise_level:
+                noise = rng.integers(-noise_level, noise_level + 1, frame.shape)
+                frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+            for patch in patches:
+                move_patch(patch, width, height)
+                draw_face_patch(
+                    frame,
+                    int(patch["x"]),
+                    int(patch["y"]),
+                    patch["size"],
+                    patch["tone"],
+                )
+            writer.write(frame)
+    finally:
+        writer.release()
+    return output_path
+
+
+def ensure_synthetic_video(
+    directory,
+    width=640,
+    height=360,
+    frames=150,
+    fps=25,
+    faces=2,
+    motion=1.0,
+    seed=0,
+):
+    output_path = os.path.join(
+        directory, synthetic_video_name(width, height, frames, faces, motion, seed)
+    )
+    if not os.path.exists(output_path):
+        generate_synthetic_video(
+            output_path,
+            width=width,
+            height=height,
+            frames=frames,
+            fps=fps,
+            faces=faces,
+            motion=motion,
+            seed=seed,
+        )
+    return output_path
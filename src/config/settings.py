@@ -16,3 +16,60 @@ DEFAULT_DEEPFACE_HOME = "outputs/deepface"
 DEFAULT_ANALYSIS_OUTPUT_DIR = "outputs/analysis"
 DEFAULT_ANALYSIS_OUTPUT_VIDEO = "annotated.mp4"
 DEFAULT_ANALYSIS_METADATA_FILE = "metadata.jsonl"
+DEFAULT_EMOTION_BATCH_SIZE = 32
+DEFAULT_DETECT_INTERVAL = 5
+DEFAULT_TRACK_MIN_CONFIDENCE = 0.5
+DEFAULT_EMOTION_REFRESH = 10
+DEFAULT_PIPELINE_MODE = "serial"
+DEFAULT_ANALYSIS_WORKERS = 2
+DEFAULT_DECODE_QUEUE_SIZE = 16
+DEFAULT_ANALYSIS_QUEUE_SIZE = 16
+DEFAULT_ENCODE_QUEUE_SIZE = 32
+DEFAULT_SEGMENT_WARMUP = 60
+DEFAULT_PROFILE_FILE = "profile.json"
+DEFAULT_BENCHMARK_DIR = "outputs/benchmarks"
+DEFAULT_BATCH_OUTPUT_DIR = "outputs/batch"
+DEFAULT_BATCH_SUMMARY_FILE = "batch_summary.json"
+DEFAULT_BATCH_WORKERS = 2
+DEFAULT_WATCH_POLL_SECONDS = 2.0
+DEFAULT_METADATA_FORMAT = "jsonl"
+DEFAULT_METADATA_BUFFER = 256
+DEFAULT_CHECKPOINT_INTERVAL = 0
+DEFAULT_CACHE_DIR = "outputs/cache"
+DEFAULT_CACHE_SIZE_MB = 2048
+DEFAULT_CACHE_BLOCK_SIZE = 256
+DEFAULT_SAMPLING = "fixed"
+DEFAULT_SAMPLE_MIN_STEP = 1
+DEFAULT_SAMPLE_MAX_STEP = 10
+DEFAULT_MOTION_LOW = 0.003
+DEFAULT_MOTION_HIGH = 0.03
+DEFAULT_CAPTURE_BACKEND = "auto"
+DEFAULT_VIDEO_BACKEND = "opencv"
+DEFAULT_ENCODE_PRESET = "veryfast"
+DEFAULT_ENCODE_CRF = 23
+DEFAULT_DECODE_STRATEGY = "grab"
+DEFAULT_KEYFRAME_INTERVAL = 250
+DEFAULT_ACTIVITY_WINDOW = 1
+DEFAULT_POSE_MIN_VISIBILITY = 0.0
+DEFAULT_ANOMALY_SIGNALS = ("motion",)
+DEFAULT_ANOMALY_METHOD = "ratio"
+DEFAULT_ANOMALY_ESTIMATOR = "window"
+DEFAULT_ANOMALY_WINDOW = 30
+DEFAULT_ANOMALY_THRESHOLD = 2.5
+DEFAULT_ANOMALY_MIN_MOTION = 0.02
+DEFAULT_IDENTITY_TOLERANCE = 0.6
+DEFAULT_CLUSTER_TOLERANCE = 0.5
+DEFAULT_DETECTION_STRATEGY = "full"
+DEFAULT_ROI_SOURCE = "coarse"
+DEFAULT_ROI_COARSE_WIDTH = 320
+DEFAULT_ROI_MARGIN = 0.5
+DEFAULT_ROI_MOTION_THRESHOLD = 25
+DEFAULT_FULL_SCAN_INTERVAL = 10
+DEFAULT_LATENCY_BUDGET_MS = 200.0
+DEFAULT_LIVE_QUEUE_SIZE = 8
+DEFAULT_LIVE_REPORT_INTERVAL = 5.0
+DEFAULT_LIVE_IDLE_TIMEOUT = 10.0
+DEFAULT_LIVE_EVENTS_FILE = "events.jsonl"
+DEFAULT_INDEX_BLOCK_SIZE = 512
+DEFAULT_FACE_MIN_CONFIDENCE = 0.5
+DEFAULT_FACE_RANGE = "full"
@@ -1,26 +1,130 @@
 import argparse
+import json
 
-from config.settings import DEFAULT_INPUT_VIDEO
-from pipeline.run_full_analysis import run_full_analysis
+from config.settings import (
+    DEFAULT_BATCH_OUTPUT_DIR,
+    DEFAULT_BATCH_WORKERS,
+    DEFAULT_INPUT_VIDEO,
+    DEFAULT_WATCH_POLL_SECONDS,
+)
+from pipeline.registry import PIPELINES, load_pipeline
+
+
+def parse_stage_every(values):
+    stage_every = {}
+    for value in values or []:
+        name, separator, interval = value.partition("=")
+        if not separator or not interval.isdigit():
+            raise ValueError(f"Expected NAME=N for --stage-every, got: {value}")
+        stage_every[name] = int(interval)
+    return stage_every
 
 
 def build_parser():
     parser = argparse.ArgumentParser()
     parser.add_argument("--input", default=DEFAULT_INPUT_VIDEO)
+    parser.add_argument("--pipeline", choices=sorted(PIPELINES), default="full")
     parser.add_argument("--output-dir", default=None)
     parser.add_argument("--output-video", default=None)
     parser.add_argument("--metadata-file", default=None)
     parser.add_argument("--frame-step", type=int, default=1)
+    parser.add_argument("--sampling", choices=["fixed", "adaptive"], default=None)
+    parser.add_argument("--sample-min-step", type=int, default=None)
+    parser.add_argument("--sample-max-step", type=int, default=None)
+    parser.add_argument("--target-fps", type=float, default=None)
+    parser.add_argument("--motion-low", type=float, default=None)
+    parser.add_argument("--motion-high", type=float, default=None)
+    parser.add_argument("--carry-annotations", action="store_true")
+    parser.add_argument("--interpolate-boxes", action="store_true")
+    parser.add_argument("--activity-window", type=int, default=None)
+    parser.add_argument("--pose-min-visibility", type=float, default=None)
+    parser.add_argument("--anomaly-signals", default=None)
+    parser.add_argument(
+        "--anomaly-method", choices=["ratio", "zscore", "mad"], default=None
+    )
+    parser.add_argument("--anomaly-estimator", choices=["window", "ewma"], default=None)
+    parser.add_argument("--anomaly-window", type=int, default=None)
+    parser.add_argument("--anomaly-threshold", type=float, default=None)
+    parser.add_argument("--anomaly-min-motion", type=float, default=None)
     parser.add_argument("--max-frames", type=int, default=None)
     parser.add_argument("--resize-width", type=int, default=None)
-    parser.add_argument("--face-model", choices=["hog", "cnn"], default=None)
+    parser.add_argument(
+        "--face-model", choices=["hog", "cnn", "haar", "mediapipe"], default=None
+    )
     parser.add_argument("--upsample", type=int, default=None)
     parser.add_argument("--face-fallback", choices=["haar", "none"], default=None)
     parser.add_argument("--haar-scale", type=float, default=None)
     parser.add_argument("--haar-neighbors", type=int, default=None)
     parser.add_argument("--min-face-size", type=int, default=None)
+    parser.add_argument("--face-min-confidence", type=float, default=None)
+    parser.add_argument("--face-range", choices=["short", "full"], default=None)
     parser.add_argument("--face-padding", type=float, default=None)
     parser.add_argument("--full-metadata", action="store_true")
+    parser.add_argument("--emotion-batch-size", type=int, default=None)
+    parser.add_argument("--track-faces", action="store_true")
+    parser.add_argument("--detect-interval", type=int, default=None)
+    parser.add_argument("--track-min-confidence", type=float, default=None)
+    parser.add_argument("--emotion-refresh", type=int, default=None)
+    parser.add_argument("--detection-strategy", choices=["full", "roi"], default=None)
+    parser.add_argument("--roi-source", choices=["coarse", "motion"], default=None)
+    parser.add_argument("--roi-coarse-width", type=int, default=None)
+    parser.add_argument("--roi-margin", type=float, default=None)
+    parser.add_argument("--roi-motion-threshold", type=int, default=None)
+    parser.add_argument("--full-scan-interval", type=int, default=None)
+    parser.add_argument("--gallery", default=None)
+    parser.add_argument("--gallery-cache", default=None)
+    parser.add_argument("--identity-tolerance", type=float, default=None)
+    parser.add_argument("--cluster-unknown", action="store_true")
+    parser.add_argument("--cluster-tolerance", type=float, default=None)
+    parser.add_argument("--pipeline-mode", choices=["serial", "threaded"], default=None)
+    parser.add_argument("--analysis-workers", type=int, default=None)
+    parser.add_argument("--decode-queue-size", type=int, default=None)
+    parser.add_argument("--analysis-queue-size", type=int, default=None)
+    parser.add_argument("--encode-queue-size", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--segment-warmup", type=int, default=None)
+    parser.add_argument("--skip-stage", action="append", default=None)
+    parser.add_argument("--stage-order", default=None)
+    parser.add_argument("--stage-every", action="append", default=None)
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--profile-frames", action="store_true")
+    parser.add_argument("--warmup-only", action="store_true")
+    parser.add_argument(
+        "--metadata-format", choices=["jsonl", "npz", "npy"], default=None
+    )
+    parser.add_argument("--metadata-buffer", type=int, default=None)
+    parser.add_argument("--checkpoint-interval", type=int, default=None)
+    parser.add_argument("--resume", action="store_true")
+    parser.add_argument("--cache", action="store_true")
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--cache-size-mb", type=int, default=None)
+    parser.add_argument(
+        "--capture-backend", choices=["auto", "ffmpeg", "gstreamer"], default=None
+    )
+    parser.add_argument("--hw-decode", action="store_true")
+    parser.add_argument(
+        "--decode-strategy", choices=["read", "grab", "seek"], default=None
+    )
+    parser.add_argument("--keyframe-interval", type=int, default=None)
+    parser.add_argument("--video-backend", choices=["opencv", "ffmpeg"], default=None)
+    parser.add_argument("--video-codec", default=None)
+    parser.add_argument("--encode-preset", default=None)
+    parser.add_argument("--encode-crf", type=int, default=None)
+    parser.add_argument("--no-video", action="store_true")
+    parser.add_argument(
+        "--live", nargs="?", const="auto", choices=["auto", "follow", "replay"]
+    )
+    parser.add_argument("--latency-budget-ms", type=float, default=None)
+    parser.add_argument("--live-queue-size", type=int, default=None)
+    parser.add_argument("--live-report-interval", type=float, default=None)
+    parser.add_argument("--live-idle-timeout", type=float, default=None)
+    parser.add_argument("--batch", default=None)
+    parser.add_argument("--watch", default=None)
+    parser.add_argument("--batch-workers", type=int, default=DEFAULT_BATCH_WORKERS)
+    parser.add_argument(
+        "--watch-poll", type=float, default=DEFAULT_WATCH_POLL_SECONDS
+    )
+    parser.add_argument("--watch-max-idle", type=float, default=None)
 
     return parser
 
@@ -28,13 +132,33 @@ def build_parser():
 def main():
     parser = build_parser()
     args = parser.parse_args()
+    try:
+        stage_every = parse_stage_every(args.stage_every)
+    except ValueError as error:
+        parser.error(str(error))
+    if args.live and (args.batch or args.watch):
+        parser.error("--live cannot be combined with --batch or --watch")
 
-    run_full_analysis(
-        args.input,
-        output_dir=args.output_dir,
-        output_video=args.output_video,
-        metadata_file=args.metadata_file,
+    options = dict(
         frame_step=args.frame_step,
+        sampling=args.sampling,
+        sample_min_step=args.sample_min_step,
+        sample_max_step=args.sample_max_step,
+        target_fps=args.target_fps,
+        motion_low=args.motion_low,
+        motion_high=args.motion_high,
+        carry_annotations=args.carry_annotations,
+        interpolate_boxes=args.interpolate_boxes,
+        activity_window=args.activity_window,
+        pose_min_visibility=args.pose_min_visibility,
+        anomaly_signals=(
+            args.anomaly_signals.split(",") if args.anomaly_signals else None
+        ),
+        anomaly_method=args.anomaly_method,
+        anomaly_estimator=args.anomaly_estimator,
+        anomaly_window=args.anomaly_window,
+        anomaly_threshold=args.anomaly_threshold,
+        anomaly_min_motion=args.anomaly_min_motion,
         max_frames=args.max_frames,
         resize_width=args.resize_width,
         face_model=args.face_model,
@@ -42,10 +166,107 @@ def main():
         face_fallback=args.face_fallback,
         haar_scale=args.haar_scale,
         haar_neighbors=args.haar_neighbors,
-        summary_only=not args.full_metadata,
+        summary_only=False if args.full_metadata else None,
         min_face_size=args.min_face_size,
+        face_min_confidence=args.face_min_confidence,
+        face_range=args.face_range,
         face_padding=args.face_padding,
+        emotion_batch_size=args.emotion_batch_size,
+        face_tracking=args.track_faces,
+        detect_interval=args.detect_interval,
+        track_min_confidence=args.track_min_confidence,
+        emotion_refresh=args.emotion_refresh,
+        detection_strategy=args.detection_strategy,
+        roi_source=args.roi_source,
+        roi_coarse_width=args.roi_coarse_width,
+        roi_margin=args.roi_margin,
+        roi_motion_threshold=args.roi_motion_threshold,
+        full_scan_interval=args.full_scan_interval,
+        gallery=args.gallery,
+        gallery_cache=args.gallery_cache,
+        identity_tolerance=args.identity_tolerance,
+        cluster_unknown=args.cluster_unknown,
+        cluster_tolerance=args.cluster_tolerance,
+        pipeline_mode=args.pipeline_mode,
+        analysis_workers=args.analysis_workers,
+        decode_queue_size=args.decode_queue_size,
+        analysis_queue_size=args.analysis_queue_size,
+        encode_queue_size=args.encode_queue_size,
+        workers=args.workers,
+        segment_warmup=args.segment_warmup,
+        skip_stages=args.skip_stage,
+        stage_order=args.stage_order.split(",") if args.stage_order else None,
+        stage_every=stage_every,
+        profile=args.profile,
+        profile_frames=args.profile_frames,
+        metadata_format=args.metadata_format,
+        metadata_buffer=args.metadata_buffer,
+        checkpoint_interval=args.checkpoint_interval,
+        resume=args.resume,
+        cache=args.cache,
+        cache_dir=args.cache_dir,
+        cache_size_mb=args.cache_size_mb,
+        capture_backend=args.capture_backend,
+        hw_decode=args.hw_decode,
+        decode_strategy=args.decode_strategy,
+        keyframe_interval=args.keyframe_interval,
+        video_backend=args.video_backend,
+        video_codec=args.video_codec,
+        encode_preset=args.encode_preset,
+        encode_crf=args.encode_crf,
+        no_video=args.no_video,
+        live=args.live,
+        latency_budget_ms=args.latency_budget_ms,
+        live_queue_size=args.live_queue_size,
+        live_report_interval=args.live_report_interval,
+        live_idle_timeout=args.live_idle_timeout,
+    )
+    if args.warmup_only:
+        from pipeline.runner import warm_up
+        from pipeline.stages import PIPELINE_STAGES
+
+        load_seconds = warm_up(stages=PIPELINE_STAGES[args.pipeline], **options)
+        print(json.dumps({"pipeline": args.pipeline, "load_seconds": load_seconds}))
+        return
+
+    if args.batch or args.watch:
+        from pipeline.batch_service import collect_inputs, run_batch, watch_folder
+
+        batch_options = dict(
+            options,
+            pipeline=args.pipeline,
+            workers=args.batch_workers,
+            output_video=args.output_video,
+            metadata_file=args.metadata_file,
+        )
+        output_root = args.output_dir or DEFAULT_BATCH_OUTPUT_DIR
+        if args.watch:
+            batch_summary = watch_folder(
+                args.watch,
+                output_root,
+                poll_seconds=args.watch_poll,
+                max_idle=args.watch_max_idle,
+                **batch_options,
+            )
+        else:
+            batch_summary = run_batch(
+                collect_inputs(args.batch), output_root, **batch_options
+            )
+        batch_summary.pop("jobs")
+        print(json.dumps(batch_summary))
+        return
+
+    if args.live:
+        options["on_event"] = lambda event: print(json.dumps(event), flush=True)
+    stats = load_pipeline(args.pipeline)(
+        args.input,
+        output_dir=args.output_dir,
+        output_video=args.output_video,
+        metadata_file=args.metadata_file,
+        **options,
     )
+    stats["pipeline"] = args.pipeline
+    print(json.dumps(stats))
 
 
 if __name__ == "__main__":
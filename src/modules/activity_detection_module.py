@@ -1,44 +1,168 @@
-import math
+from collections import deque
+from functools import lru_cache
 
 import cv2
-import mediapipe as mp
-
-
-def create_activity_state():
-    pose = None
-    if hasattr(mp, "solutions"):
-        pose = mp.solutions.pose.Pose(
-            static_image_mode=False,
-            model_complexity=1,
-            enable_segmentation=False,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5,
-        )
+import numpy as np
+
+from utils.frame_context import get_gray, get_rgb, store_copy
+
+
+@lru_cache(maxsize=None)
+def load_mediapipe():
+    import mediapipe as mp
+
+    return mp
+
+
+def create_pose(model_complexity=1):
+    mp = load_mediapipe()
+    if not hasattr(mp, "solutions"):
+        return None
+    return mp.solutions.pose.Pose(
+        static_image_mode=False,
+        model_complexity=model_complexity,
+        enable_segmentation=False,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5,
+    )
+
+
+POSE_POOL = {}
+
+
+def acquire_pose(model_complexity=1):
+    free = POSE_POOL.setdefault(model_complexity, deque())
+    try:
+        return free.pop()
+    except IndexError:
+        return create_pose(model_complexity=model_complexity)
+
+
+def release_pose(pose, model_complexity=1):
+    if pose is None:
+        return
+    pose.reset()
+    POSE_POOL.setdefault(model_complexity, deque()).append(pose)
+
+
+POSE_LANDMARK_COUNT = 33
+LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_WRIST, RIGHT_WRIST = 11, 12, 15, 16
+SHOULDERS = np.array([LEFT_SHOULDER, RIGHT_SHOULDER])
+WRISTS = np.array([LEFT_WRIST, RIGHT_WRIST])
+
+
+def create_feature_window(size=1, features=2):
+    return {
+        "values": np.zeros((max(1, size), features), dtype=np.float64),
+        "sums": np.zeros(features, dtype=np.float64),
+        "index": 0,
+        "count": 0,
+    }
+
+
+def push_features(window, features):
+    values = window["values"]
+    index = window["index"]
+    if window["count"] == len(values):
+        window["sums"] -= values[index]
+    else:
+        window["count"] += 1
+    values[index] = features
+    window["sums"] += values[index]
+    window["index"] = (index + 1) % len(values)
+    return window["sums"] / window["count"]
+
+
+def create_activity_state(window=1, lite_pose=False, min_visibility=0.0):
+    pose = acquire_pose()
     return {
         "pose": pose,
-        "prev_landmarks": None,
+        "lite_pose": acquire_pose(model_complexity=0) if pose and lite_pose else None,
+        "landmarks": np.zeros((POSE_LANDMARK_COUNT, 3), dtype=np.float64),
+        "prev_landmarks": np.zeros((POSE_LANDMARK_COUNT, 3), dtype=np.float64),
+        "has_prev": False,
+        "features": create_feature_window(window),
+        "min_visibility": min_visibility,
         "prev_gray": None,
+        "motion_diff": None,
     }
 
 
-def detect_activity(frame_bgr, state):
+def release_activity_state(state):
+    release_pose(state["pose"])
+    release_pose(state["lite_pose"], model_complexity=0)
+    state["pose"] = None
+    state["lite_pose"] = None
+
+
+def save_activity_state(state):
+    features = state["features"]
+    return {
+        "prev_landmarks": state["prev_landmarks"].copy() if state["has_prev"] else None,
+        "features": {
+            "values": features["values"].copy(),
+            "sums": features["sums"].copy(),
+            "index": features["index"],
+            "count": features["count"],
+        },
+        "prev_gray": state["prev_gray"],
+    }
+
+
+def restore_activity_state(state, saved):
+    state["has_prev"] = saved["prev_landmarks"] is not None
+    if state["has_prev"]:
+        state["prev_landmarks"][:] = saved["prev_landmarks"]
+    features = state["features"]
+    if len(saved["features"]["values"]) == len(features["values"]):
+        features["values"][:] = saved["features"]["values"]
+        features["sums"][:] = saved["features"]["sums"]
+        features["index"] = saved["features"]["index"]
+        features["count"] = saved["features"]["count"]
+    state["prev_gray"] = saved["prev_gray"]
+
+
+def landmarks_to_array(landmarks, out):
+    out[:] = [(landmark.x, landmark.y, landmark.visibility) for landmark in landmarks]
+    return out
+
+
+def detect_activity(frame_bgr, state, context=None, frame_gap=1, lite=False):
     if state["pose"]:
-        rgb_frame = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-        result = state["pose"].process(rgb_frame)
+        if context is not None:
+            rgb_frame = get_rgb(context)
+        else:
+            rgb_frame = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+        pose = state["lite_pose"] if lite and state["lite_pose"] else state["pose"]
+        result = pose.process(rgb_frame)
         if not result.pose_landmarks:
-            state["prev_landmarks"] = None
+            state["has_prev"] = False
             return "unknown", 0.0
 
-        landmarks = result.pose_landmarks.landmark
-        movement_score = compute_movement(landmarks, state["prev_landmarks"])
-        activity = classify_activity(landmarks, movement_score)
-        state["prev_landmarks"] = landmarks
+        landmarks = landmarks_to_array(
+            result.pose_landmarks.landmark, state["landmarks"]
+        )
+        movement_score = 0.0
+        if state["has_prev"]:
+            movement_score = (
+                compute_movement(
+                    landmarks, state["prev_landmarks"], state["min_visibility"]
+                )
+                / frame_gap
+            )
+        movement, arm_raised = push_features(
+            state["features"], (movement_score, is_arm_raised(landmarks))
+        )
+        activity = classify_activity(arm_raised >= 0.5, movement)
+        state["landmarks"], state["prev_landmarks"] = state["prev_landmarks"], landmarks
+        state["has_prev"] = True
         return activity, movement_score
-    return detect_activity_by_motion(frame_bgr, state)
+    return detect_activity_by_motion(
+        frame_bgr, state, context=context, frame_gap=frame_gap
+    )
 
 
-def classify_activity(landmarks, movement):
-    arm_raised = is_arm_raised(landmarks)
+def classify_activity(arm_raised, movement):
     if arm_raised and movement > 0.01:
         return "gesturing"
     if movement > 0.02:
@@ -48,38 +172,37 @@ def classify_activity(landmarks, movement):
     return "idle"
 
 
-def compute_movement(landmarks, prev_landmarks):
-    if not prev_landmarks:
-        return 0.0
-    total = 0.0
-    count = 0
-    for current, previous in zip(landmarks, prev_landmarks):
-        total += math.hypot(current.x - previous.x, current.y - previous.y)
-        count += 1
-    return total / count if count else 0.0
+def compute_movement(landmarks, prev_landmarks, min_visibility=0.0):
+    distances = np.hypot(
+        landmarks[:, 0] - prev_landmarks[:, 0], landmarks[:, 1] - prev_landmarks[:, 1]
+    )
+    if min_visibility > 0.0:
+        visible = np.minimum(landmarks[:, 2], prev_landmarks[:, 2]) >= min_visibility
+        if visible.any():
+            distances = distances[visible]
+    return float(distances.mean())
 
 
 def is_arm_raised(landmarks):
-    left_wrist = landmarks[mp.solutions.pose.PoseLandmark.LEFT_WRIST.value]
-    right_wrist = landmarks[mp.solutions.pose.PoseLandmark.RIGHT_WRIST.value]
-    left_shoulder = landmarks[mp.solutions.pose.PoseLandmark.LEFT_SHOULDER.value]
-    right_shoulder = landmarks[mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER.value]
-    left_raised = left_wrist.y < left_shoulder.y
-    right_raised = right_wrist.y < right_shoulder.y
-    return left_raised or right_raised
+    return bool((landmarks[WRISTS, 1] < landmarks[SHOULDERS, 1]).any())
 
 
-def detect_activity_by_motion(frame_bgr, state):
-    gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+def detect_activity_by_motion(frame_bgr, state, context=None, frame_gap=1):
+    if context is not None:
+        gray = get_gray(context)
+    else:
+        gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
     if state["prev_gray"] is None:
-        state["prev_gray"] = gray
+        state["prev_gray"] = gray.copy()
         return "unknown", 0.0
-    diff = cv2.absdiff(state["prev_gray"], gray)
-    motion_score = diff.mean() / 255.0
-    state["prev_gray"] = gray
-    if motion_score > 0.08:
+    diff = cv2.absdiff(state["prev_gray"], gray, dst=state["motion_diff"])
+    state["motion_diff"] = diff
+    motion_score = diff.mean() / 255.0 / frame_gap
+    state["prev_gray"] = store_copy(state["prev_gray"], gray)
+    motion, _ = push_features(state["features"], (motion_score, 0.0))
+    if motion > 0.08:
         return "high_motion", motion_score
-    if motion_score > 0.03:
+    if motion > 0.03:
         return "low_motion", motion_score
     return "idle", motion_score
 
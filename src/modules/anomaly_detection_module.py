@@ -0,0 +1,192 @@
+from collections import Counter
+
+import numpy as np
+
+ANOMALY_SIGNALS = ("motion", "faces", "emotions")
+ANOMALY_METHODS = ("ratio", "zscore", "mad")
+ANOMALY_ESTIMATORS = ("window", "ewma")
+SIGNAL_MIN_VALUES = {"motion": 0.02, "faces": 0.5, "emotions": 0.25}
+MAD_SCALE = 1.2533
+
+
+def create_rolling_stats(window=30, estimator="window"):
+    window = max(1, window)
+    return {
+        "estimator": estimator,
+        "alpha": 2.0 / (window + 1),
+        "values": np.zeros(window, dtype=np.float64),
+        "deviations": np.zeros(window, dtype=np.float64),
+        "index": 0,
+        "count": 0,
+        "mean": 0.0,
+        "m2": 0.0,
+        "deviation_sum": 0.0,
+    }
+
+
+def update_rolling_stats(stats, value):
+    if stats["estimator"] == "ewma":
+        update_ewma_stats(stats, value)
+    else:
+        update_window_stats(stats, value)
+
+
+def update_ewma_stats(stats, value):
+    if not stats["count"]:
+        stats["mean"] = value
+        stats["count"] = 1
+        return
+    alpha = stats["alpha"]
+    diff = value - stats["mean"]
+    increment = alpha * diff
+    stats["mean"] += increment
+    stats["m2"] = (1.0 - alpha) * (stats["m2"] + diff * increment)
+    stats["deviation_sum"] = (1.0 - alpha) * stats["deviation_sum"] + alpha * abs(diff)
+    stats["count"] += 1
+
+
+def update_window_stats(stats, value):
+    values = stats["values"]
+    deviations = stats["deviations"]
+    index = stats["index"]
+    count = stats["count"]
+    mean = stats["mean"]
+    deviation = abs(value - mean) if count else 0.0
+    if count == len(values):
+        previous = values[index]
+        new_mean = mean + (value - previous) / count
+        stats["m2"] += (value - previous) * (value - new_mean + previous - mean)
+        stats["deviation_sum"] -= deviations[index]
+    else:
+        count += 1
+        new_mean = mean + (value - mean) / count
+        stats["m2"] += (value - mean) * (value - new_mean)
+    stats["mean"] = new_mean
+    stats["m2"] = max(stats["m2"], 0.0)
+    stats["deviation_sum"] += deviation
+    stats["count"] = count
+    values[index] = value
+    deviations[index] = deviation
+    stats["index"] = (index + 1) % len(values)
+
+
+def rolling_std(stats):
+    if stats["estimator"] == "ewma":
+        return float(np.sqrt(stats["m2"]))
+    if stats["count"] < 2:
+        return 0.0
+    return float(np.sqrt(stats["m2"] / (stats["count"] - 1)))
+
+
+def rolling_deviation(stats):
+    if stats["estimator"] == "ewma":
+        return stats["deviation_sum"]
+    return stats["deviation_sum"] / stats["count"] if stats["count"] else 0.0
+
+
+def create_anomaly_detector(
+    signals=("motion",),
+    method="ratio",
+    window=30,
+    threshold=2.5,
+    estimator="window",
+    min_values=None,
+):
+    min_values = dict(SIGNAL_MIN_VALUES, **(min_values or {}))
+    return {
+        "method": method,
+        "threshold": threshold,
+        "signals": {
+            name: {
+                "stats": create_rolling_stats(window, estimator),
+                "min_value": min_values[name],
+            }
+            for name in signals
+        },
+        "prev_face_count": None,
+        "prev_emotions": None,
+    }
+
+
+def score_signal(detector, entry, value):
+    stats = entry["stats"]
+    if value <= entry["min_value"]:
+        update_rolling_stats(stats, value)
+        return False
+    if detector["method"] == "ratio":
+        update_rolling_stats(stats, value)
+        return bool(value > stats["mean"] * detector["threshold"])
+    if stats["count"] < 2:
+        update_rolling_stats(stats, value)
+        return False
+    if detector["method"] == "mad":
+        scale = MAD_SCALE * rolling_deviation(stats)
+    else:
+        scale = rolling_std(stats)
+    deviation = value - stats["mean"]
+    update_rolling_stats(stats, value)
+    if scale <= 1e-12:
+        return deviation > 0
+    return bool(deviation / scale > detector["threshold"])
+
+
+def emotion_shift(previous, current):
+    if not previous and not current:
+        return 0.0
+    if not previous or not current:
+        return 1.0
+    previous_counts = Counter(previous)
+    current_counts = Counter(current)
+    labels = set(previous_counts) | set(current_counts)
+    return 0.5 * sum(
+        abs(
+            previous_counts[label] / len(previous)
+            - current_counts[label] / len(current)
+        )
+        for label in labels
+    )
+
+
+def detect_anomalies(detector, motion_score=None, face_count=None, emotions=None):
+    signals = detector["signals"]
+    triggered = []
+    if "motion" in signals and motion_score:
+        if score_signal(detector, signals["motion"], float(motion_score)):
+            triggered.append("motion")
+    if "faces" in signals and face_count is not None:
+        previous = detector["prev_face_count"]
+        detector["prev_face_count"] = face_count
+        if previous is not None:
+            change = float(abs(face_count - previous))
+            if score_signal(detector, signals["faces"], change):
+                triggered.append("faces")
+    if "emotions" in signals and emotions is not None:
+        previous = detector["prev_emotions"]
+        detector["prev_emotions"] = list(emotions)
+        if previous is not None:
+            shift = emotion_shift(previous, emotions)
+            if score_signal(detector, signals["emotions"], shift):
+                triggered.append("emotions")
+    return triggered
+
+
+def save_anomaly_detector(detector):
+    return {
+        "signals": {
+            name: {
+                key: value.copy() if isinstance(value, np.ndarray) else value
+                for key, value in entry["stats"].items()
+            }
+            for name, entry in detector["signals"].items()
+        },
+        "prev_face_count": detector["prev_face_count"],
+        "prev_emotions": detector["prev_emotions"],
+    }
+
+
+def restore_anomaly_detector(detector, saved):
+    for name, stats in saved["signals"].items():
+        if name in detector["signals"]:
+            detector["signals"][name]["stats"].update(stats)
+    detector["prev_face_count"] = saved["prev_face_count"]
+    detector["prev_emotions"] = saved["prev_emotions"]
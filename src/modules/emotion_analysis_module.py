@@ -1,19 +1,28 @@
 import os
 import warnings
+from functools import lru_cache
 
 import cv2
+import numpy as np
 
 from config.settings import DEFAULT_DEEPFACE_HOME
 
-os.environ.setdefault("DEEPFACE_HOME", DEFAULT_DEEPFACE_HOME)
-os.makedirs(DEFAULT_DEEPFACE_HOME, exist_ok=True)
-from deepface import DeepFace
+EMOTION_LABELS = ("angry", "disgust", "fear", "happy", "sad", "surprise", "neutral")
+EMOTION_INPUT_SIZE = 48
 
-warnings.filterwarnings(
-    "ignore",
-    message="pkg_resources is deprecated as an API.*",
-    category=UserWarning,
-)
+
+@lru_cache(maxsize=None)
+def load_deepface():
+    os.environ.setdefault("DEEPFACE_HOME", DEFAULT_DEEPFACE_HOME)
+    os.makedirs(os.environ["DEEPFACE_HOME"], exist_ok=True)
+    warnings.filterwarnings(
+        "ignore",
+        message="pkg_resources is deprecated as an API.*",
+        category=UserWarning,
+    )
+    from deepface import DeepFace
+
+    return DeepFace
 
 
 def expand_box(box, frame_shape, padding=0.15):
@@ -30,30 +39,121 @@ def expand_box(box, frame_shape, padding=0.15):
     return new_top, new_right, new_bottom, new_left
 
 
+def crop_face(frame_bgr, box, padding=0.15):
+    p_top, p_right, p_bottom, p_left = expand_box(box, frame_bgr.shape, padding=padding)
+    return frame_bgr[p_top:p_bottom, p_left:p_right]
+
+
+def analyze_face_region(face_region):
+    if face_region.size == 0:
+        return "unknown"
+    try:
+        result = load_deepface().analyze(
+            face_region,
+            actions=["emotion"],
+            detector_backend="skip",
+            enforce_detection=False,
+        )
+        if isinstance(result, list) and result:
+            return result[0].get("dominant_emotion", "unknown")
+        return result.get("dominant_emotion", "unknown")
+    except Exception:
+        return "unknown"
+
+
 def analyze_emotions(frame_bgr, face_boxes, face_padding=0.15):
-    emotions = []
-    for top, right, bottom, left in face_boxes:
-        box = (top, right, bottom, left)
-        padded = expand_box(box, frame_bgr.shape, padding=face_padding)
-        p_top, p_right, p_bottom, p_left = padded
-        face_region = frame_bgr[p_top:p_bottom, p_left:p_right]
-        if face_region.size == 0:
-            emotions.append("unknown")
-            continue
+    return [
+        analyze_face_region(crop_face(frame_bgr, box, padding=face_padding))
+        for box in face_boxes
+    ]
+
+
+@lru_cache(maxsize=None)
+def load_emotion_model():
+    DeepFace = load_deepface()
+    try:
+        client = DeepFace.build_model(model_name="Emotion", task="facial_attribute")
+    except TypeError:
+        client = DeepFace.build_model("Emotion")
+    return getattr(client, "model", client)
+
+
+def create_emotion_engine(batch_size=32, face_padding=0.15):
+    model = None
+    if batch_size and batch_size > 1:
+        try:
+            model = load_emotion_model()
+        except Exception:
+            model = None
+    return {
+        "model": model,
+        "batch_size": batch_size,
+        "face_padding": face_padding,
+    }
+
+
+def prepare_emotion_input(face_region):
+    gray = cv2.cvtColor(face_region, cv2.COLOR_BGR2GRAY)
+    height, width = gray.shape
+    side = max(height, width)
+    pad_y = side - height
+    pad_x = side - width
+    if pad_x or pad_y:
+        gray = cv2.copyMakeBorder(
+            gray,
+            pad_y // 2,
+            pad_y - pad_y // 2,
+            pad_x // 2,
+            pad_x - pad_x // 2,
+            cv2.BORDER_CONSTANT,
+            value=0,
+        )
+    return cv2.resize(
+        gray, (EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE), interpolation=cv2.INTER_AREA
+    )
+
+
+def predict_emotion_batch(model, faces, batch_size):
+    batch = np.zeros(
+        (batch_size, EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE, 1), dtype=np.float32
+    )
+    batch[: len(faces), :, :, 0] = np.stack(faces)
+    batch *= 1.0 / 255.0
+    predictions = np.asarray(model.predict_on_batch(batch))[: len(faces)]
+    return [EMOTION_LABELS[index] for index in np.argmax(predictions, axis=1)]
+
+
+def analyze_emotions_batch(engine, frames_with_boxes):
+    face_padding = engine["face_padding"]
+    if engine["model"] is None:
+        return [
+            analyze_emotions(frame_bgr, face_boxes, face_padding=face_padding)
+            for frame_bgr, face_boxes in frames_with_boxes
+        ]
+
+    results = [["unknown"] * len(face_boxes) for _, face_boxes in frames_with_boxes]
+    regions = []
+    faces = []
+    slots = []
+    for item_index, (frame_bgr, face_boxes) in enumerate(frames_with_boxes):
+        for face_index, box in enumerate(face_boxes):
+            face_region = crop_face(frame_bgr, box, padding=face_padding)
+            if face_region.size == 0:
+                continue
+            regions.append(face_region)
+            faces.append(prepare_emotion_input(face_region))
+            slots.append((item_index, face_index))
+
+    batch_size = engine["batch_size"]
+    for start in range(0, len(faces), batch_size):
+        end = start + batch_size
         try:
-            result = DeepFace.analyze(
-                face_region,
-                actions=["emotion"],
-                detector_backend="skip",
-                enforce_detection=False,
-            )
-            if isinstance(result, list) and result:
-                emotions.append(result[0].get("dominant_emotion", "unknown"))
-            else:
-                emotions.append(result.get("dominant_emotion", "unknown"))
+            labels = predict_emotion_batch(engine["model"], faces[start:end], batch_size)
         except Exception:
-            emotions.append("unknown")
-    return emotions
+            labels = [analyze_face_region(region) for region in regions[start:end]]
+        for (item_index, face_index), label in zip(slots[start:end], labels):
+            results[item_index][face_index] = label
+    return results
 
 
 def draw_emotions(frame_bgr, face_boxes, emotions):
@@ -0,0 +1,194 @@
+import json
+import os
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from modules.face_recognition_module import load_face_recognition
+
+GALLERY_FILE = "gallery.npz"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+ENCODING_SIZE = 128
+
+
+def list_gallery_images(gallery_dir):
+    images = []
+    for root, _, files in os.walk(gallery_dir):
+        for name in sorted(files):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, gallery_dir)
+            parent = os.path.dirname(relative)
+            label = parent.split(os.sep)[0] if parent else os.path.splitext(name)[0]
+            images.append((relative, label))
+    return sorted(images)
+
+
+def build_gallery_manifest(gallery_dir, images):
+    entries = []
+    for relative, label in images:
+        stat = os.stat(os.path.join(gallery_dir, relative))
+        entries.append([relative, label, stat.st_size, stat.st_mtime_ns])
+    return json.dumps(entries)
+
+
+def encode_gallery_images(gallery_dir, images):
+    face_recognition = load_face_recognition()
+    encodings = []
+    labels = []
+    for relative, label in images:
+        image = face_recognition.load_image_file(os.path.join(gallery_dir, relative))
+        found = face_recognition.face_encodings(image)
+        if found:
+            encodings.append(found[0])
+            labels.append(label)
+    matrix = np.asarray(encodings, dtype=np.float64).reshape(-1, ENCODING_SIZE)
+    return matrix, np.asarray(labels, dtype=str)
+
+
+def create_gallery(encodings, labels):
+    return {
+        "encodings": encodings,
+        "norms": np.einsum("ij,ij->i", encodings, encodings),
+        "labels": labels,
+    }
+
+
+@lru_cache(maxsize=None)
+def load_gallery(gallery_dir, cache_path=None):
+    cache_path = cache_path or os.path.join(gallery_dir, GALLERY_FILE)
+    images = list_gallery_images(gallery_dir)
+    manifest = build_gallery_manifest(gallery_dir, images)
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as data:
+            if str(data["manifest"]) == manifest:
+                return create_gallery(data["encodings"], data["labels"])
+    encodings, labels = encode_gallery_images(gallery_dir, images)
+    temp_path = cache_path + ".tmp.npz"
+    np.savez(
+        temp_path, encodings=encodings, labels=labels, manifest=np.array(manifest)
+    )
+    os.replace(temp_path, cache_path)
+    return create_gallery(encodings, labels)
+
+
+def create_empty_gallery():
+    return create_gallery(
+        np.zeros((0, ENCODING_SIZE), dtype=np.float64), np.asarray([], dtype=str)
+    )
+
+
+def pairwise_distances(encodings, references, reference_norms):
+    squared = (
+        np.einsum("ij,ij->i", encodings, encodings)[:, None]
+        + reference_norms[None, :]
+        - 2.0 * encodings @ references.T
+    )
+    return np.sqrt(np.clip(squared, 0.0, None))
+
+
+def match_encodings(gallery, encodings, tolerance=0.6):
+    if not len(encodings) or not len(gallery["labels"]):
+        return [None] * len(encodings)
+    distances = pairwise_distances(encodings, gallery["encodings"], gallery["norms"])
+    best = distances.argmin(axis=1)
+    best_distances = distances[np.arange(len(best)), best]
+    return [
+        str(gallery["labels"][index]) if distance <= tolerance else None
+        for index, distance in zip(best, best_distances)
+    ]
+
+
+def compute_face_encodings(frame_bgr, face_boxes):
+    if not face_boxes:
+        return np.zeros((0, ENCODING_SIZE), dtype=np.float64)
+    rgb_frame = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+    encodings = load_face_recognition().face_encodings(
+        rgb_frame, known_face_locations=[tuple(map(int, box)) for box in face_boxes]
+    )
+    return np.asarray(encodings, dtype=np.float64).reshape(-1, ENCODING_SIZE)
+
+
+def create_unknown_clusters(tolerance=0.5, start_id=1, capacity=64):
+    return {
+        "centroids": np.zeros((capacity, ENCODING_SIZE), dtype=np.float64),
+        "norms": np.zeros(capacity, dtype=np.float64),
+        "counts": np.zeros(capacity, dtype=np.int64),
+        "labels": [],
+        "size": 0,
+        "tolerance": tolerance,
+        "next_id": start_id,
+    }
+
+
+def grow_clusters(clusters):
+    capacity = len(clusters["counts"]) * 2
+    clusters["centroids"] = np.resize(
+        clusters["centroids"], (capacity, ENCODING_SIZE)
+    )
+    clusters["norms"] = np.resize(clusters["norms"], capacity)
+    clusters["counts"] = np.resize(clusters["counts"], capacity)
+
+
+def assign_unknown(clusters, encoding):
+    size = clusters["size"]
+    if size:
+        distances = pairwise_distances(
+            encoding[None, :], clusters["centroids"][:size], clusters["norms"][:size]
+        )[0]
+        index = int(distances.argmin())
+        if distances[index] <= clusters["tolerance"]:
+            clusters["counts"][index] += 1
+            centroid = clusters["centroids"][index]
+            centroid += (encoding - centroid) / clusters["counts"][index]
+            clusters["norms"][index] = centroid @ centroid
+            return clusters["labels"][index]
+    if size == len(clusters["counts"]):
+        grow_clusters(clusters)
+    clusters["centroids"][size] = encoding
+    clusters["norms"][size] = encoding @ encoding
+    clusters["counts"][size] = 1
+    clusters["labels"].append(f"unknown_{clusters['next_id']}")
+    clusters["next_id"] += 1
+    clusters["size"] = size + 1
+    return clusters["labels"][size]
+
+
+def save_unknown_clusters(clusters):
+    size = clusters["size"]
+    return {
+        "centroids": clusters["centroids"][:size].copy(),
+        "counts": clusters["counts"][:size].copy(),
+        "labels": list(clusters["labels"]),
+        "next_id": clusters["next_id"],
+    }
+
+
+def restore_unknown_clusters(clusters, saved):
+    size = len(saved["labels"])
+    while len(clusters["counts"]) < size:
+        grow_clusters(clusters)
+    centroids = saved["centroids"]
+    clusters["centroids"][:size] = centroids
+    clusters["norms"][:size] = np.einsum("ij,ij->i", centroids, centroids)
+    clusters["counts"][:size] = saved["counts"]
+    clusters["labels"] = list(saved["labels"])
+    clusters["next_id"] = saved["next_id"]
+    clusters["size"] = size
+
+
+def draw_identities(frame_bgr, face_boxes, identities):
+    for (top, right, bottom, left), identity in zip(face_boxes, identities):
+        cv2.putText(
+            frame_bgr,
+            identity,
+            (left, bottom + 16),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.5,
+            (255, 128, 0),
+            1,
+            cv2.LINE_AA,
+        )
+    return frame_bgr
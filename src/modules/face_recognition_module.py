@@ -1,32 +1,136 @@
 import warnings
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 import cv2
+import numpy as np
 
-warnings.filterwarnings(
-    "ignore",
-    message="pkg_resources is deprecated as an API.*",
-    category=UserWarning,
-)
-import face_recognition
+from modules.activity_detection_module import load_mediapipe
+from utils.frame_context import get_gray, get_rgb, store_copy
 
 
-def detect_faces_with_haar(frame_bgr, scale_factor=1.1, min_neighbors=5, min_size=40):
-    gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
-    frontal_path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-    profile_path = cv2.data.haarcascades + "haarcascade_profileface.xml"
-    frontal = cv2.CascadeClassifier(frontal_path)
-    profile = cv2.CascadeClassifier(profile_path)
-    faces = []
-    for classifier in (frontal, profile):
-        detected = classifier.detectMultiScale(
-            gray,
-            scaleFactor=scale_factor,
-            minNeighbors=min_neighbors,
-            minSize=(min_size, min_size),
+HAAR_CASCADES = ("haarcascade_frontalface_default.xml", "haarcascade_profileface.xml")
+FACE_MODELS = ("hog", "cnn", "haar", "mediapipe")
+MEDIAPIPE_FACE_RANGES = {"short": 0, "full": 1}
+
+
+@lru_cache(maxsize=None)
+def load_face_recognition():
+    warnings.filterwarnings(
+        "ignore",
+        message="pkg_resources is deprecated as an API.*",
+        category=UserWarning,
+    )
+    import face_recognition
+
+    return face_recognition
+
+
+def warm_up_face_detector(model="hog", **options):
+    detector = create_face_detector(model, **options)
+    detector["detect"](np.zeros((64, 64, 3), dtype=np.uint8))
+    close_face_detector(detector)
+
+
+def load_haar_classifiers():
+    return tuple(
+        cv2.CascadeClassifier(cv2.data.haarcascades + cascade) for cascade in HAAR_CASCADES
+    )
+
+
+def create_haar_detector(scale_factor=1.1, min_neighbors=5, min_size=40, concurrent=True):
+    classifiers = load_haar_classifiers()
+    executor = None
+    if concurrent and len(classifiers) > 1:
+        executor = ThreadPoolExecutor(max_workers=len(classifiers) - 1)
+    return {
+        "classifiers": classifiers,
+        "scale_factor": scale_factor,
+        "min_neighbors": min_neighbors,
+        "min_size": min_size,
+        "executor": executor,
+    }
+
+
+def close_haar_detector(detector):
+    if detector["executor"] is not None:
+        detector["executor"].shutdown(wait=True)
+        detector["executor"] = None
+
+
+def run_cascade(classifier, gray, detector):
+    min_size = detector["min_size"]
+    detected, neighbors = classifier.detectMultiScale2(
+        gray,
+        scaleFactor=detector["scale_factor"],
+        minNeighbors=detector["min_neighbors"],
+        minSize=(min_size, min_size),
+    )
+    boxes = [(y, x + w, y + h, x) for x, y, w, h in detected]
+    return boxes, [float(score) for score in np.ravel(neighbors)]
+
+
+def non_max_suppression(face_boxes, scores, iou_threshold=0.3):
+    if len(face_boxes) < 2:
+        return list(face_boxes)
+    boxes = np.asarray(face_boxes, dtype=np.float32)
+    top, right, bottom, left = boxes.T
+    areas = (right - left) * (bottom - top)
+    order = np.argsort(-np.asarray(scores, dtype=np.float32), kind="stable")
+    keep = []
+    while order.size:
+        current = order[0]
+        keep.append(current)
+        rest = order[1:]
+        inter_w = np.minimum(right[current], right[rest]) - np.maximum(left[current], left[rest])
+        inter_h = np.minimum(bottom[current], bottom[rest]) - np.maximum(top[current], top[rest])
+        intersection = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+        iou = intersection / (areas[current] + areas[rest] - intersection)
+        order = rest[iou <= iou_threshold]
+    return [tuple(face_boxes[index]) for index in sorted(keep)]
+
+
+def detect_faces_with_haar(
+    frame_bgr,
+    scale_factor=1.1,
+    min_neighbors=5,
+    min_size=40,
+    detector=None,
+    gray=None,
+):
+    owns_detector = detector is None
+    if owns_detector:
+        detector = create_haar_detector(
+            scale_factor=scale_factor,
+            min_neighbors=min_neighbors,
+            min_size=min_size,
+            concurrent=False,
         )
-        for x, y, w, h in detected:
-            faces.append((y, x + w, y + h, x))
-    return faces
+    if gray is None:
+        gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+    primary, *secondary = detector["classifiers"]
+    executor = detector["executor"]
+    if executor is not None:
+        futures = [
+            executor.submit(run_cascade, classifier, gray, detector)
+            for classifier in secondary
+        ]
+        results = [run_cascade(primary, gray, detector)]
+        results.extend(future.result() for future in futures)
+    else:
+        results = [
+            run_cascade(classifier, gray, detector)
+            for classifier in detector["classifiers"]
+        ]
+    if owns_detector:
+        close_haar_detector(detector)
+
+    faces = []
+    scores = []
+    for boxes, box_scores in results:
+        faces.extend(boxes)
+        scores.extend(box_scores)
+    return non_max_suppression(faces, scores)
 
 
 def filter_faces(frame_shape, face_boxes, min_size=40, min_ratio=0.6, max_ratio=1.6):
@@ -46,6 +150,100 @@ def filter_faces(frame_shape, face_boxes, min_size=40, min_ratio=0.6, max_ratio=
     return filtered
 
 
+def create_dlib_face_detector(options):
+    face_recognition = load_face_recognition()
+    model = options.get("model", "hog")
+    upsample = options.get("upsample", 1)
+
+    def detect(rgb_frame, gray=None):
+        return face_recognition.face_locations(
+            rgb_frame, number_of_times_to_upsample=upsample, model=model
+        )
+
+    return {"model": model, "detect": detect, "close": None, "upscale": True}
+
+
+def create_haar_face_detector(options):
+    haar_detector = create_haar_detector(
+        scale_factor=options.get("haar_scale", 1.1),
+        min_neighbors=options.get("haar_neighbors", 5),
+        min_size=options.get("min_size", 40),
+        concurrent=False,
+    )
+
+    def detect(rgb_frame, gray=None):
+        if gray is None:
+            gray = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2GRAY)
+        return detect_faces_with_haar(None, detector=haar_detector, gray=gray)
+
+    def close():
+        close_haar_detector(haar_detector)
+
+    return {"model": "haar", "detect": detect, "close": close, "upscale": False}
+
+
+def load_mediapipe_face_detection():
+    mp = load_mediapipe()
+    if not hasattr(mp, "solutions"):
+        raise RuntimeError(
+            "--face-model mediapipe requires a mediapipe build that ships "
+            "mediapipe.solutions.face_detection"
+        )
+    return mp.solutions.face_detection
+
+
+def relative_to_face_boxes(detections, frame_shape):
+    height, width = frame_shape[:2]
+    face_boxes = []
+    for detection in detections:
+        box = detection.location_data.relative_bounding_box
+        top = max(0, int(round(box.ymin * height)))
+        left = max(0, int(round(box.xmin * width)))
+        bottom = min(height, int(round((box.ymin + box.height) * height)))
+        right = min(width, int(round((box.xmin + box.width) * width)))
+        if bottom > top and right > left:
+            face_boxes.append((top, right, bottom, left))
+    return face_boxes
+
+
+def create_mediapipe_face_detector(options):
+    solution = load_mediapipe_face_detection().FaceDetection(
+        model_selection=MEDIAPIPE_FACE_RANGES[options.get("face_range", "full")],
+        min_detection_confidence=options.get("min_confidence", 0.5),
+    )
+
+    def detect(rgb_frame, gray=None):
+        results = solution.process(np.ascontiguousarray(rgb_frame))
+        return relative_to_face_boxes(results.detections or [], rgb_frame.shape)
+
+    return {
+        "model": "mediapipe",
+        "detect": detect,
+        "close": solution.close,
+        "upscale": True,
+    }
+
+
+FACE_DETECTOR_FACTORIES = {
+    "hog": create_dlib_face_detector,
+    "cnn": create_dlib_face_detector,
+    "haar": create_haar_face_detector,
+    "mediapipe": create_mediapipe_face_detector,
+}
+
+
+def create_face_detector(model="hog", **options):
+    if model not in FACE_DETECTOR_FACTORIES:
+        raise ValueError(f"Unknown face model: {model}")
+    return FACE_DETECTOR_FACTORIES[model](dict(options, model=model))
+
+
+def close_face_detector(detector):
+    if detector["close"] is not None:
+        detector["close"]()
+        detector["close"] = None
+
+
 def detect_faces(
     frame_bgr,
     model="hog",
@@ -54,21 +252,262 @@ def detect_faces(
     haar_scale=1.1,
     haar_neighbors=5,
     min_size=40,
+    min_confidence=0.5,
+    face_range="full",
+    haar_detector=None,
+    face_detector=None,
+    gray=None,
+    context=None,
 ):
-    rgb_frame = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-    face_boxes = face_recognition.face_locations(
-        rgb_frame, number_of_times_to_upsample=upsample, model=model
-    )
-    if not face_boxes and fallback == "haar":
+    if context is not None:
+        rgb_frame = get_rgb(context)
+        if gray is None and model == "haar":
+            gray = get_gray(context)
+    else:
+        rgb_frame = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+    owns_detector = face_detector is None
+    if owns_detector:
+        face_detector = create_face_detector(
+            model,
+            upsample=upsample,
+            haar_scale=haar_scale,
+            haar_neighbors=haar_neighbors,
+            min_size=min_size,
+            min_confidence=min_confidence,
+            face_range=face_range,
+        )
+    face_boxes = face_detector["detect"](rgb_frame, gray)
+    if owns_detector:
+        close_face_detector(face_detector)
+    if not face_boxes and fallback == "haar" and model != "haar":
+        if gray is None and context is not None:
+            gray = get_gray(context)
         face_boxes = detect_faces_with_haar(
             frame_bgr,
             scale_factor=haar_scale,
             min_neighbors=haar_neighbors,
             min_size=min_size,
+            detector=haar_detector,
+            gray=gray,
         )
     return filter_faces(frame_bgr.shape, face_boxes, min_size=min_size)
 
 
+def create_roi_state(
+    full_scan_interval=10,
+    source="coarse",
+    coarse_width=320,
+    margin=0.5,
+    min_crop=160,
+    motion_threshold=25,
+):
+    return {
+        "full_scan_interval": max(1, full_scan_interval),
+        "source": source,
+        "coarse_width": coarse_width,
+        "margin": margin,
+        "motion_threshold": motion_threshold,
+        "min_crop": min_crop,
+        "frames_since_full": None,
+        "prev_boxes": [],
+        "prev_gray": None,
+        "motion_diff": None,
+    }
+
+
+def find_coarse_candidates(rgb_frame, coarse_width, face_detector):
+    height, width = rgb_frame.shape[:2]
+    if width <= coarse_width:
+        return face_detector["detect"](rgb_frame)
+    coarse_height = max(1, int(height * coarse_width / width))
+    coarse = cv2.resize(
+        rgb_frame, (coarse_width, coarse_height), interpolation=cv2.INTER_AREA
+    )
+    face_boxes = face_detector["detect"](coarse)
+    return scale_boxes(face_boxes, width / coarse_width, height / coarse_height)
+
+
+def find_motion_candidates(state, gray, min_size=40):
+    previous = state["prev_gray"]
+    if previous is None:
+        state["prev_gray"] = gray.copy()
+        return []
+    diff = cv2.absdiff(previous, gray, dst=state["motion_diff"])
+    state["motion_diff"] = diff
+    state["prev_gray"] = store_copy(previous, gray)
+    _, mask = cv2.threshold(diff, state["motion_threshold"], 255, cv2.THRESH_BINARY)
+    mask = cv2.dilate(mask, None, iterations=2)
+    contours = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[-2]
+    candidates = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if w < min_size and h < min_size:
+            continue
+        pad_x = max(0, min_size * 2 - w) // 2
+        pad_y = max(0, min_size * 2 - h) // 2
+        candidates.append((y - pad_y, x + w + pad_x, y + h + pad_y, x - pad_x))
+    return candidates
+
+
+def expand_region(box, frame_shape, margin=0.5):
+    height, width = frame_shape[:2]
+    top, right, bottom, left = box
+    pad_x = int((right - left) * margin)
+    pad_y = int((bottom - top) * margin)
+    return (
+        max(0, top - pad_y),
+        min(width, right + pad_x),
+        min(height, bottom + pad_y),
+        max(0, left - pad_x),
+    )
+
+
+def merge_regions(regions):
+    merged = []
+    for region in sorted(regions, key=lambda box: (box[3], box[0])):
+        for index, other in enumerate(merged):
+            if (
+                region[3] <= other[1]
+                and other[3] <= region[1]
+                and region[0] <= other[2]
+                and other[0] <= region[2]
+            ):
+                merged[index] = (
+                    min(region[0], other[0]),
+                    max(region[1], other[1]),
+                    max(region[2], other[2]),
+                    min(region[3], other[3]),
+                )
+                break
+        else:
+            merged.append(region)
+    return merged if len(merged) == len(regions) else merge_regions(merged)
+
+
+def detect_in_region(rgb_frame, region, face_detector, min_crop=160):
+    top, right, bottom, left = region
+    crop = rgb_frame[top:bottom, left:right]
+    if not crop.size:
+        return []
+    scale = 1.0
+    shortest = min(crop.shape[:2])
+    if face_detector["upscale"] and shortest < min_crop:
+        scale = min_crop / float(shortest)
+        crop = cv2.resize(
+            crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR
+        )
+    face_boxes = face_detector["detect"](np.ascontiguousarray(crop))
+    if scale != 1.0:
+        face_boxes = scale_boxes(face_boxes, 1.0 / scale, 1.0 / scale)
+    return [
+        (box_top + top, box_right + left, box_bottom + top, box_left + left)
+        for box_top, box_right, box_bottom, box_left in face_boxes
+    ]
+
+
+def detect_faces_roi(
+    frame_bgr,
+    state,
+    model="hog",
+    upsample=1,
+    fallback="haar",
+    haar_scale=1.1,
+    haar_neighbors=5,
+    min_size=40,
+    min_confidence=0.5,
+    face_range="full",
+    haar_detector=None,
+    face_detector=None,
+    context=None,
+):
+    motion = state["source"] == "motion"
+    if context is not None:
+        rgb_frame = get_rgb(context)
+        gray = get_gray(context) if motion else None
+    else:
+        rgb_frame = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+        gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY) if motion else None
+    candidates = find_motion_candidates(state, gray, min_size) if motion else None
+    frames_since_full = state["frames_since_full"]
+    interval = state["full_scan_interval"]
+    downscaled = motion or rgb_frame.shape[1] > state["coarse_width"]
+    if not downscaled or frames_since_full is None or frames_since_full + 1 >= interval:
+        face_boxes = detect_faces(
+            frame_bgr,
+            model=model,
+            upsample=upsample,
+            fallback=fallback,
+            haar_scale=haar_scale,
+            haar_neighbors=haar_neighbors,
+            min_size=min_size,
+            min_confidence=min_confidence,
+            face_range=face_range,
+            haar_detector=haar_detector,
+            face_detector=face_detector,
+            gray=gray,
+            context=context,
+        )
+        state["frames_since_full"] = 0
+        state["prev_boxes"] = face_boxes
+        return face_boxes
+
+    state["frames_since_full"] = frames_since_full + 1
+    owns_detector = face_detector is None
+    if owns_detector:
+        face_detector = create_face_detector(
+            model,
+            upsample=upsample,
+            haar_scale=haar_scale,
+            haar_neighbors=haar_neighbors,
+            min_size=min_size,
+            min_confidence=min_confidence,
+            face_range=face_range,
+        )
+    if candidates is None:
+        coarse_detector = face_detector
+        if model in ("hog", "cnn"):
+            coarse_detector = create_face_detector("hog")
+        candidates = find_coarse_candidates(
+            rgb_frame, state["coarse_width"], coarse_detector
+        )
+    regions = merge_regions(
+        [
+            expand_region(box, rgb_frame.shape, state["margin"])
+            for box in list(candidates) + list(state["prev_boxes"])
+        ]
+    )
+    face_boxes = []
+    for region in regions:
+        face_boxes.extend(
+            detect_in_region(
+                rgb_frame, region, face_detector, min_crop=state["min_crop"]
+            )
+        )
+    if owns_detector:
+        close_face_detector(face_detector)
+    face_boxes = non_max_suppression(
+        face_boxes,
+        [(right - left) * (bottom - top) for top, right, bottom, left in face_boxes],
+    )
+    face_boxes = filter_faces(frame_bgr.shape, face_boxes, min_size=min_size)
+    state["prev_boxes"] = face_boxes
+    return face_boxes
+
+
+def scale_boxes(face_boxes, scale_x, scale_y):
+    scaled = []
+    for top, right, bottom, left in face_boxes:
+        scaled.append(
+            (
+                int(top * scale_y),
+                int(right * scale_x),
+                int(bottom * scale_y),
+                int(left * scale_x),
+            )
+        )
+    return scaled
+
+
 def draw_face_boxes(frame_bgr, face_boxes):
     for top, right, bottom, left in face_boxes:
         cv2.rectangle(frame_bgr, (left, top), (right, bottom), (0, 255, 0), 2)
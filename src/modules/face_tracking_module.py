@@ -0,0 +1,200 @@
+import cv2
+import numpy as np
+
+from utils.frame_context import store_copy
+
+
+def create_tracking_state(detect_interval=5, min_confidence=0.5, emotion_refresh=10):
+    return {
+        "tracks": [],
+        "next_id": 1,
+        "prev_gray": None,
+        "frames_since_detection": None,
+        "detect_interval": max(1, detect_interval),
+        "min_confidence": min_confidence,
+        "emotion_refresh": max(1, emotion_refresh),
+    }
+
+
+def needs_detection(state):
+    if state["prev_gray"] is None or state["frames_since_detection"] is None:
+        return True
+    if state["frames_since_detection"] >= state["detect_interval"]:
+        return True
+    return any(track["confidence"] < state["min_confidence"] for track in state["tracks"])
+
+
+def box_iou(box_a, box_b):
+    top = max(box_a[0], box_b[0])
+    right = min(box_a[1], box_b[1])
+    bottom = min(box_a[2], box_b[2])
+    left = max(box_a[3], box_b[3])
+    intersection = max(0, right - left) * max(0, bottom - top)
+    if not intersection:
+        return 0.0
+    area_a = (box_a[1] - box_a[3]) * (box_a[2] - box_a[0])
+    area_b = (box_b[1] - box_b[3]) * (box_b[2] - box_b[0])
+    return intersection / float(area_a + area_b - intersection)
+
+
+def match_boxes(previous_boxes, face_boxes, min_iou=0.3):
+    pairs = sorted(
+        (
+            (box_iou(previous_box, box), previous_index, box_index)
+            for previous_index, previous_box in enumerate(previous_boxes)
+            for box_index, box in enumerate(face_boxes)
+        ),
+        reverse=True,
+    )
+    matched = set()
+    assigned = {}
+    for iou, previous_index, box_index in pairs:
+        if iou < min_iou:
+            break
+        if previous_index in matched or box_index in assigned:
+            continue
+        matched.add(previous_index)
+        assigned[box_index] = previous_index
+    return assigned
+
+
+def interpolate_boxes(start_boxes, end_boxes, ratio, start_ids=None, end_ids=None):
+    if (
+        start_ids is not None
+        and end_ids is not None
+        and len(start_ids) == len(start_boxes)
+        and len(end_ids) == len(end_boxes)
+    ):
+        end_by_id = dict(zip(end_ids, end_boxes))
+        targets = [end_by_id.get(track_id) for track_id in start_ids]
+    else:
+        targets = [None] * len(start_boxes)
+        for end_index, start_index in match_boxes(start_boxes, end_boxes, 0.1).items():
+            targets[start_index] = end_boxes[end_index]
+    interpolated = []
+    for start, end in zip(start_boxes, targets):
+        if end is None:
+            interpolated.append(tuple(start))
+            continue
+        interpolated.append(
+            tuple(int(round(a + (b - a) * ratio)) for a, b in zip(start, end))
+        )
+    return interpolated
+
+
+def update_tracks(state, face_boxes, min_iou=0.3):
+    previous = state["tracks"]
+    assigned = {
+        box_index: previous[track_index]
+        for box_index, track_index in match_boxes(
+            [track["box"] for track in previous], face_boxes, min_iou
+        ).items()
+    }
+
+    tracks = []
+    for box_index, box in enumerate(face_boxes):
+        track = assigned.get(box_index)
+        if track is None:
+            track = {
+                "id": state["next_id"],
+                "emotion": None,
+                "emotion_age": None,
+            }
+            state["next_id"] += 1
+        track["box"] = tuple(int(value) for value in box)
+        track["confidence"] = 1.0
+        tracks.append(track)
+    state["tracks"] = tracks
+    state["frames_since_detection"] = 0
+    return tracks
+
+
+def sample_track_points(gray, box, max_points=20):
+    top, right, bottom, left = box
+    mask = np.zeros(gray.shape, dtype=np.uint8)
+    mask[max(0, top):max(0, bottom), max(0, left):max(0, right)] = 255
+    points = cv2.goodFeaturesToTrack(
+        gray, maxCorners=max_points, qualityLevel=0.01, minDistance=3, mask=mask
+    )
+    if points is None:
+        return np.empty((0, 1, 2), dtype=np.float32)
+    return points.astype(np.float32)
+
+
+def propagate_tracks(state, gray, max_error=1.0, min_points=3):
+    prev_gray = state["prev_gray"]
+    tracks = state["tracks"]
+    state["frames_since_detection"] += 1
+    if not tracks:
+        return tracks
+
+    point_sets = [sample_track_points(prev_gray, track["box"]) for track in tracks]
+    counts = [len(points) for points in point_sets]
+    if not sum(counts):
+        for track in tracks:
+            track["confidence"] = 0.0
+        return tracks
+
+    points = np.concatenate(point_sets)
+    forward, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, points, None)
+    backward, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, forward, None)
+    error = np.linalg.norm((points - backward).reshape(-1, 2), axis=1)
+    valid = (status.ravel() == 1) & (back_status.ravel() == 1) & (error < max_error)
+    displacement = (forward - points).reshape(-1, 2)
+
+    height, width = gray.shape[:2]
+    offset = 0
+    for track, count in zip(tracks, counts):
+        track_valid = valid[offset:offset + count]
+        track_shift = displacement[offset:offset + count][track_valid]
+        offset += count
+        if len(track_shift) < min_points:
+            track["confidence"] = 0.0
+            continue
+        shift_x, shift_y = np.median(track_shift, axis=0)
+        top, right, bottom, left = track["box"]
+        top = int(round(top + shift_y))
+        bottom = int(round(bottom + shift_y))
+        left = int(round(left + shift_x))
+        right = int(round(right + shift_x))
+        if top < 0 or left < 0 or bottom > height or right > width:
+            track["confidence"] = 0.0
+            continue
+        track["box"] = (top, right, bottom, left)
+        track["confidence"] = min(track["confidence"], len(track_shift) / float(count))
+    return tracks
+
+
+def track_faces(state, gray, detect):
+    if needs_detection(state):
+        tracks = update_tracks(state, detect())
+    else:
+        tracks = propagate_tracks(state, gray)
+    state["prev_gray"] = store_copy(state["prev_gray"], gray)
+    return list(tracks)
+
+
+def select_emotion_refresh(state, tracks):
+    needed = []
+    for track in tracks:
+        age = track["emotion_age"]
+        refresh = age is None or age >= state["emotion_refresh"]
+        track["emotion_age"] = 0 if refresh else age + 1
+        needed.append(refresh)
+    return needed
+
+
+def resolve_track_emotions(tracks, needed, labels):
+    pending_labels = iter(labels)
+    emotions = []
+    for track, refresh in zip(tracks, needed):
+        if refresh:
+            track["emotion"] = next(pending_labels, "unknown")
+        emotions.append(track["emotion"] or "unknown")
+    return emotions
+
+
+def reset_emotion_refresh(tracks):
+    for track in tracks:
+        if track["emotion"] is None:
+            track["emotion_age"] = None
@@ -0,0 +1,269 @@
+import glob
+import json
+import multiprocessing
+import os
+import shutil
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from config.settings import DEFAULT_BATCH_SUMMARY_FILE, DEFAULT_WATCH_POLL_SECONDS
+from pipeline.engine import (
+    build_summary,
+    merge_summary_states,
+    restore_summary_state,
+)
+from pipeline.registry import load_pipeline
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v")
+WORKER_STATE = {}
+
+
+def is_video(path):
+    return os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS
+
+
+def list_videos(directory):
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if is_video(name) and os.path.isfile(os.path.join(directory, name))
+    )
+
+
+def read_manifest(manifest_path):
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, "r", encoding="utf-8") as manifest_handle:
+        if manifest_path.lower().endswith(".json"):
+            data = json.load(manifest_handle)
+            entries = data["inputs"] if isinstance(data, dict) else data
+        else:
+            entries = [
+                line.strip()
+                for line in manifest_handle
+                if line.strip() and not line.lstrip().startswith("#")
+            ]
+    return [os.path.join(base_dir, os.path.expanduser(entry)) for entry in entries]
+
+
+def collect_inputs(source):
+    if os.path.isdir(source):
+        inputs = list_videos(source)
+    elif os.path.isfile(source):
+        inputs = [source] if is_video(source) else read_manifest(source)
+    else:
+        inputs = sorted(
+            path for path in glob.glob(source, recursive=True) if is_video(path)
+        )
+    if not inputs:
+        raise FileNotFoundError(f"No input videos found for: {source}")
+    return inputs
+
+
+def assign_output_dir(output_root, input_path, used_names):
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    name = stem
+    suffix = 2
+    while name in used_names:
+        name = f"{stem}_{suffix}"
+        suffix += 1
+    used_names.add(name)
+    return os.path.join(output_root, name)
+
+
+def init_worker(pipeline, options):
+    from pipeline.runner import warm_up
+    from pipeline.stages import PIPELINE_STAGES
+
+    WORKER_STATE["pipeline"] = load_pipeline(pipeline)
+    WORKER_STATE["options"] = options
+    WORKER_STATE["load_seconds"] = warm_up(stages=PIPELINE_STAGES[pipeline], **options)
+
+
+def process_video(input_path, output_dir, output_video=None, metadata_file=None):
+    result = {"input": input_path, "output_dir": output_dir, "worker_pid": os.getpid()}
+    started_at = time.perf_counter()
+    try:
+        stats = WORKER_STATE["pipeline"](
+            input_path,
+            output_dir=output_dir,
+            output_video=output_video,
+            metadata_file=metadata_file,
+            **WORKER_STATE["options"],
+        )
+        result["status"] = "ok"
+        result["stats"] = stats
+    except Exception as error:
+        result["status"] = "failed"
+        result["error"] = f"{type(error).__name__}: {error}"
+        result["traceback"] = traceback.format_exc()
+    result["elapsed_seconds"] = time.perf_counter() - started_at
+    result["worker_load_seconds"] = WORKER_STATE["load_seconds"]
+    return result
+
+
+def create_worker_pool(workers, pipeline, options):
+    return ProcessPoolExecutor(
+        max_workers=max(1, workers),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(pipeline, dict(options, workers=1)),
+    )
+
+
+def merge_video_summaries(summaries):
+    return build_summary(
+        merge_summary_states(restore_summary_state(summary) for summary in summaries)
+    )
+
+
+def build_batch_summary(results, elapsed, workers, pipeline):
+    succeeded = [result for result in results if result["status"] == "ok"]
+    frames_processed = sum(
+        result["stats"]["frames_processed"] for result in succeeded
+    )
+    return {
+        "pipeline": pipeline,
+        "workers": workers,
+        "videos": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "frames_processed": frames_processed,
+        "elapsed_seconds": elapsed,
+        "fps": frames_processed / elapsed if elapsed else 0.0,
+        "videos_per_hour": len(succeeded) * 3600.0 / elapsed if elapsed else 0.0,
+        "summary": merge_video_summaries(
+            result["stats"]["summary"] for result in succeeded
+        ),
+        "jobs": results,
+    }
+
+
+def write_batch_summary(output_root, batch_summary):
+    summary_path = os.path.join(output_root, DEFAULT_BATCH_SUMMARY_FILE)
+    temp_path = summary_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as summary_handle:
+        json.dump(batch_summary, summary_handle, indent=2)
+    os.replace(temp_path, summary_path)
+    return summary_path
+
+
+def run_batch(
+    inputs,
+    output_root,
+    pipeline="full",
+    workers=2,
+    output_video=None,
+    metadata_file=None,
+    **options,
+):
+    os.makedirs(output_root, exist_ok=True)
+    used_names = set()
+    jobs = [
+        (input_path, assign_output_dir(output_root, input_path, used_names))
+        for input_path in inputs
+    ]
+    started_at = time.perf_counter()
+    with create_worker_pool(workers, pipeline, options) as executor:
+        futures = [
+            executor.submit(
+                process_video, input_path, output_dir, output_video, metadata_file
+            )
+            for input_path, output_dir in jobs
+        ]
+        results = [future.result() for future in futures]
+    batch_summary = build_batch_summary(
+        results, time.perf_counter() - started_at, workers, pipeline
+    )
+    batch_summary["summary_path"] = write_batch_summary(output_root, batch_summary)
+    return batch_summary
+
+
+def find_ready_videos(folder, sizes):
+    ready = []
+    current = {}
+    for path in list_videos(folder):
+        size = os.path.getsize(path)
+        current[path] = size
+        if size and sizes.get(path) == size:
+            ready.append(path)
+    sizes.clear()
+    sizes.update(current)
+    return ready
+
+
+def move_to(folder, path):
+    os.makedirs(folder, exist_ok=True)
+    target = os.path.join(folder, os.path.basename(path))
+    stem, extension = os.path.splitext(target)
+    suffix = 2
+    while os.path.exists(target):
+        target = f"{stem}_{suffix}{extension}"
+        suffix += 1
+    shutil.move(path, target)
+    return target
+
+
+def watch_folder(
+    folder,
+    output_root,
+    pipeline="full",
+    workers=2,
+    poll_seconds=DEFAULT_WATCH_POLL_SECONDS,
+    max_idle=None,
+    output_video=None,
+    metadata_file=None,
+    **options,
+):
+    os.makedirs(folder, exist_ok=True)
+    os.makedirs(output_root, exist_ok=True)
+    processed_dir = os.path.join(folder, "processed")
+    failed_dir = os.path.join(folder, "failed")
+    used_names = {
+        name
+        for name in os.listdir(output_root)
+        if os.path.isdir(os.path.join(output_root, name))
+    }
+    sizes = {}
+    pending = {}
+    results = []
+    started_at = time.perf_counter()
+    idle_since = time.monotonic()
+    batch_summary = build_batch_summary(results, 0.0, workers, pipeline)
+    with create_worker_pool(workers, pipeline, options) as executor:
+        while True:
+            in_flight = set(pending.values())
+            for input_path in find_ready_videos(folder, sizes):
+                if input_path in in_flight:
+                    continue
+                output_dir = assign_output_dir(output_root, input_path, used_names)
+                future = executor.submit(
+                    process_video, input_path, output_dir, output_video, metadata_file
+                )
+                pending[future] = input_path
+
+            if pending:
+                done, _ = wait(
+                    pending, timeout=poll_seconds, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    input_path = pending.pop(future)
+                    result = future.result()
+                    archive_dir = failed_dir
+                    if result["status"] == "ok":
+                        archive_dir = processed_dir
+                    result["archived_input"] = move_to(archive_dir, input_path)
+                    results.append(result)
+                if done:
+                    batch_summary = build_batch_summary(
+                        results, time.perf_counter() - started_at, workers, pipeline
+                    )
+                    write_batch_summary(output_root, batch_summary)
+                idle_since = time.monotonic()
+                continue
+
+            if max_idle is not None and time.monotonic() - idle_since >= max_idle:
+                break
+            time.sleep(poll_seconds)
+    batch_summary["summary_path"] = write_batch_summary(output_root, batch_summary)
+    return batch_summary
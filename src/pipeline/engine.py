@@ -0,0 +1,574 @@
+import pickle
+import time
+from collections import Counter
+
+import cv2
+
+from pipeline.threaded_execution import run_serial, run_threaded
+from utils.frame_context import (
+    acquire_frame_buffers,
+    create_buffer_pool,
+    create_frame_context,
+    release_frame_buffers,
+)
+from utils.frame_sampling import sample_frame
+from utils.profiling import (
+    add_frame_timings,
+    create_profile_state,
+    merge_profile_states,
+    timed,
+)
+from utils.video_io import skip_frames
+
+SOURCE_KEYS = ("frame", "frame_index", "frame_gap", "context")
+RECORD_KEYS = (
+    "identities",
+    "emotions",
+    "activity",
+    "motion_score",
+    "is_anomaly",
+    "anomaly_motion",
+    "anomaly_faces",
+    "anomaly_emotions",
+)
+
+
+def create_stage(
+    name,
+    inputs=(),
+    outputs=(),
+    process=None,
+    process_batch=None,
+    should_flush=None,
+    carry=None,
+    carry_keys=(),
+    close=None,
+    parallel=False,
+    warmup=False,
+    on_skipped=False,
+    every=1,
+    save=None,
+    restore=None,
+    cache_params=None,
+):
+    return {
+        "name": name,
+        "inputs": tuple(inputs),
+        "outputs": tuple(outputs),
+        "process": process,
+        "process_batch": process_batch,
+        "should_flush": should_flush,
+        "carry": carry,
+        "carry_keys": tuple(carry_keys),
+        "close": close,
+        "parallel": parallel,
+        "warmup": warmup,
+        "on_skipped": on_skipped,
+        "every": every,
+        "save": save,
+        "restore": restore,
+        "cache_params": cache_params,
+    }
+
+
+def select_stage_names(names, skip=(), order=None):
+    known = set(names)
+    unknown = [name for name in [*skip, *(order or ())] if name not in known]
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(unknown)}")
+    selected = [name for name in names if name not in skip]
+    if order:
+        rank = {name: index for index, name in enumerate(order)}
+        selected.sort(key=lambda name: rank.get(name, len(rank)))
+    return selected
+
+
+def validate_stages(stages):
+    available = set(SOURCE_KEYS)
+    for stage in stages:
+        missing = [key for key in stage["inputs"] if key not in available]
+        if missing:
+            raise ValueError(
+                f"Stage '{stage['name']}' requires {', '.join(missing)}, "
+                "which no earlier stage produces"
+            )
+        available.update(stage["outputs"])
+
+
+def close_stages(stages):
+    for stage in stages:
+        if stage["close"] is not None:
+            stage["close"]()
+
+
+def default_carry(stage, item, last):
+    for key in stage["outputs"]:
+        item[key] = last.get(key)
+
+
+def create_summary_state(profile=False):
+    return {
+        "processed_frames": 0,
+        "faces_detected": 0,
+        "anomaly_count": 0,
+        "emotion_counts": Counter(),
+        "activity_counts": Counter(),
+        "profile": create_profile_state() if profile else None,
+        "load_seconds": {},
+        "cache": {},
+        "identities": {},
+    }
+
+
+def create_identity_summary():
+    return {"frames": 0, "anomalies": 0, "emotions": Counter(), "activities": Counter()}
+
+
+def merge_identity_summaries(target, source):
+    for identity, stats in source.items():
+        merged = target.setdefault(identity, create_identity_summary())
+        merged["frames"] += stats["frames"]
+        merged["anomalies"] += stats.get("anomalies", 0)
+        merged["emotions"].update(stats["emotions"])
+        merged["activities"].update(stats["activities"])
+
+
+def merge_summary_states(summary_states):
+    summary_states = list(summary_states)
+    profile_states = [
+        summary_state["profile"]
+        for summary_state in summary_states
+        if summary_state["profile"] is not None
+    ]
+    merged = create_summary_state()
+    if profile_states:
+        merged["profile"] = merge_profile_states(profile_states)
+    for summary_state in summary_states:
+        merged["processed_frames"] += summary_state["processed_frames"]
+        merged["faces_detected"] += summary_state["faces_detected"]
+        merged["anomaly_count"] += summary_state["anomaly_count"]
+        merged["emotion_counts"].update(summary_state["emotion_counts"])
+        merged["activity_counts"].update(summary_state["activity_counts"])
+        merge_identity_summaries(merged["identities"], summary_state["identities"])
+        for key, count in summary_state["cache"].items():
+            merged["cache"][key] = merged["cache"].get(key, 0) + count
+        for name, seconds in summary_state["load_seconds"].items():
+            merged["load_seconds"][name] = max(
+                seconds, merged["load_seconds"].get(name, 0.0)
+            )
+    return merged
+
+
+def build_summary(summary_state, top_k=3):
+    activity_counts = summary_state["activity_counts"]
+    emotion_counts = summary_state["emotion_counts"]
+    summary = {
+        "frames_processed": summary_state["processed_frames"],
+        "faces_detected": summary_state["faces_detected"],
+        "anomalies_detected": summary_state["anomaly_count"],
+        "activities": dict(activity_counts),
+        "emotions": dict(emotion_counts),
+        "top_activities": [
+            {"label": label, "count": count}
+            for label, count in activity_counts.most_common(top_k)
+        ],
+        "top_emotions": [
+            {"label": label, "count": count}
+            for label, count in emotion_counts.most_common(top_k)
+        ],
+    }
+    if summary_state["identities"]:
+        summary["identities"] = {
+            identity: {
+                "frames": stats["frames"],
+                "anomalies": stats["anomalies"],
+                "emotions": dict(stats["emotions"]),
+                "activities": dict(stats["activities"]),
+            }
+            for identity, stats in sorted(summary_state["identities"].items())
+        }
+    return summary
+
+
+def restore_summary_state(summary):
+    summary_state = create_summary_state()
+    summary_state["processed_frames"] = summary["frames_processed"]
+    summary_state["faces_detected"] = summary["faces_detected"]
+    summary_state["anomaly_count"] = summary["anomalies_detected"]
+    summary_state["activity_counts"].update(summary["activities"])
+    summary_state["emotion_counts"].update(summary["emotions"])
+    for identity, stats in summary.get("identities", {}).items():
+        summary_state["identities"][identity] = {
+            "frames": stats["frames"],
+            "anomalies": stats.get("anomalies", 0),
+            "emotions": Counter(stats["emotions"]),
+            "activities": Counter(stats["activities"]),
+        }
+    return summary_state
+
+
+def update_summary(summary_state, item):
+    summary_state["processed_frames"] += 1
+    summary_state["faces_detected"] += len(item.get("boxes") or [])
+    summary_state["emotion_counts"].update(item.get("emotions") or [])
+    if "activity" in item:
+        summary_state["activity_counts"].update([item["activity"]])
+    if item.get("is_anomaly"):
+        summary_state["anomaly_count"] += 1
+    emotions = item.get("emotions") or []
+    for index, identity in enumerate(item.get("identities") or []):
+        stats = summary_state["identities"].setdefault(
+            identity, create_identity_summary()
+        )
+        stats["frames"] += 1
+        if item.get("is_anomaly"):
+            stats["anomalies"] += 1
+        if index < len(emotions):
+            stats["emotions"].update([emotions[index]])
+        if "activity" in item:
+            stats["activities"].update([item["activity"]])
+
+
+def build_record(item, fps, include_timings=False):
+    frame_index = item["frame_index"]
+    record = {
+        "frame_index": int(frame_index),
+        "timestamp": float(frame_index / fps if fps else 0.0),
+    }
+    if "boxes" in item:
+        face_boxes = item["boxes"]
+        record["face_count"] = int(len(face_boxes))
+        record["boxes"] = [list(map(int, box)) for box in face_boxes]
+    for key in RECORD_KEYS:
+        if key in item:
+            record[key] = item[key]
+    if "motion_score" in record:
+        record["motion_score"] = float(record["motion_score"])
+    if item.get("tracks") is not None:
+        record["track_ids"] = item["track_ids"]
+    if "captured_at" in item:
+        record["latency_ms"] = round(
+            (time.perf_counter() - item["captured_at"]) * 1000.0, 3
+        )
+    if include_timings and "timings" in item:
+        record["timings_ms"] = {
+            name: round(seconds * 1000.0, 3) for name, seconds in item["timings"].items()
+        }
+    return record
+
+
+def write_output(writer, sink, frame, record):
+    if frame is not None:
+        writer.write(frame)
+    if record is None:
+        return
+    if "checkpoint" in record:
+        sink["checkpoint"](record["checkpoint"])
+    else:
+        sink["write"](record)
+
+
+def read_frames(
+    capture,
+    frame_step=1,
+    max_frames=None,
+    start_frame=0,
+    end_frame=None,
+    emit_from=0,
+    profile=False,
+    sampler=None,
+    skip_decode=False,
+    decode_strategy="grab",
+    keyframe_interval=250,
+):
+    if start_frame:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    frame_index = start_frame
+    processed_frames = 0
+    skippable = sampler is None and frame_step > 1
+    while end_frame is None or frame_index < end_frame:
+        if skippable and frame_index % frame_step and (
+            skip_decode or frame_index < emit_from
+        ):
+            target_index = frame_index + frame_step - frame_index % frame_step
+            if end_frame is not None:
+                target_index = min(target_index, end_frame)
+            if not skip_decode:
+                target_index = min(target_index, emit_from)
+            frame_index = skip_frames(
+                capture,
+                frame_index,
+                target_index,
+                strategy=decode_strategy,
+                keyframe_interval=keyframe_interval,
+            )
+            if frame_index is None:
+                return
+            continue
+        started_at = time.perf_counter() if profile else None
+        success, frame = capture.read()
+        if not success:
+            return
+        if sampler is not None:
+            analyzed, frame_gap = sample_frame(sampler, frame)
+        else:
+            analyzed = frame_step <= 1 or frame_index % frame_step == 0
+            frame_gap = 1
+        warmup = frame_index < emit_from
+        if analyzed or not warmup:
+            item = {
+                "frame_index": frame_index,
+                "frame": frame,
+                "analyzed": analyzed,
+                "warmup": warmup,
+                "frame_gap": frame_gap,
+            }
+            if profile:
+                item["started_at"] = started_at
+                item["timings"] = {"decode": time.perf_counter() - started_at}
+            yield item
+        frame_index += 1
+        if analyzed and not warmup:
+            processed_frames += 1
+            if max_frames and processed_frames >= max_frames:
+                return
+
+
+def run_engine(
+    frames,
+    stages,
+    write,
+    fps,
+    summary_only=True,
+    resize_width=None,
+    pipeline_mode="serial",
+    analysis_workers=2,
+    decode_queue_size=16,
+    analysis_queue_size=16,
+    encode_queue_size=32,
+    profile=False,
+    profile_frames=False,
+    checkpoint_interval=0,
+    checkpoint_state=False,
+    resume_state=None,
+    carry_forward=False,
+):
+    validate_stages(stages)
+    parallel_count = 0
+    while (
+        parallel_count < len(stages)
+        and stages[parallel_count]["parallel"]
+        and stages[parallel_count]["every"] == 1
+        and stages[parallel_count]["process"] is not None
+    ):
+        parallel_count += 1
+    last_context_stage = max(
+        (index for index, stage in enumerate(stages) if "context" in stage["inputs"]),
+        default=-1,
+    )
+    runtime = [{"count": 0, "last": None, "pending": []} for _ in stages]
+    carried_keys = [
+        key
+        for stage in stages
+        if not stage["on_skipped"]
+        for key in stage["outputs"] + stage["carry_keys"]
+    ]
+    carried = {"frame_index": None, "outputs": None}
+    buffer_pool = create_buffer_pool()
+    summary_state = create_summary_state(profile=profile)
+    profile_state = summary_state["profile"]
+    if profile:
+        write = timed(profile_state, "encode", write)
+
+    def release_context(item):
+        context = item.pop("context", None)
+        if context is not None:
+            release_frame_buffers(buffer_pool, context["buffers"])
+
+    def select_run(index, item):
+        stage = stages[index]
+        if not item["analyzed"]:
+            return carry_forward and stage["on_skipped"] and not item["warmup"]
+        if item["warmup"]:
+            return stage["warmup"]
+        if stage["name"] in item.get("shed", ()):
+            return False
+        state = runtime[index]
+        selected = state["count"] % stage["every"] == 0
+        state["count"] += 1
+        return selected
+
+    def complete(index, item, selected):
+        stage = stages[index]
+        state = runtime[index]
+        if selected:
+            state["last"] = {
+                key: item.get(key) for key in stage["outputs"] + stage["carry_keys"]
+            }
+        elif item["analyzed"] and not item["warmup"] and state["last"] is not None:
+            carry = stage["carry"] or default_carry
+            carry(stage, item, state["last"])
+        if index == last_context_stage:
+            release_context(item)
+
+    def run_process(stage, item):
+        if "timings" not in item:
+            stage["process"](item)
+            return
+        started_at = time.perf_counter()
+        stage["process"](item)
+        item["timings"][stage["name"]] = time.perf_counter() - started_at
+
+    def run_process_batch(stage, items):
+        if "timings" not in items[0]:
+            stage["process_batch"](items)
+            return
+        started_at = time.perf_counter()
+        stage["process_batch"](items)
+        share = (time.perf_counter() - started_at) / len(items)
+        for item in items:
+            item["timings"][stage["name"]] = share
+
+    def prepare(item):
+        item["context"] = create_frame_context(
+            item["frame"],
+            buffers=acquire_frame_buffers(buffer_pool),
+            resize_width=resize_width,
+        )
+        for index in range(parallel_count):
+            selected = select_run(index, item)
+            if selected:
+                run_process(stages[index], item)
+            complete(index, item, selected)
+
+    def remember_outputs(item):
+        carried["frame_index"] = item["frame_index"]
+        carried["outputs"] = {key: item[key] for key in carried_keys if key in item}
+
+    def apply_carried(item):
+        if "carried_from" in item or carried["outputs"] is None:
+            return
+        item.update(carried["outputs"])
+        item["carried_from"] = carried["frame_index"]
+
+    def advance(item, position, emit):
+        for index in range(position, len(stages)):
+            stage = stages[index]
+            if carry_forward and stage["on_skipped"] and not item["analyzed"]:
+                apply_carried(item)
+            if stage["process_batch"] is not None and (
+                stage["warmup"] or not item["warmup"]
+            ):
+                item["selected"] = select_run(index, item)
+                pending = runtime[index]["pending"]
+                pending.append(item)
+                if stage["should_flush"](pending):
+                    flush_stage(index, emit)
+                return
+            selected = select_run(index, item)
+            if selected and stage["process"] is not None:
+                run_process(stage, item)
+            complete(index, item, selected)
+        release_context(item)
+        if item["warmup"]:
+            return
+        record = None
+        if item["analyzed"]:
+            if carry_forward:
+                remember_outputs(item)
+            update_summary(summary_state, item)
+            if not summary_only:
+                record = build_record(item, fps, include_timings=profile_frames)
+        if "timings" in item:
+            add_frame_timings(
+                profile_state, item["timings"], time.perf_counter() - item["started_at"]
+            )
+        emit(item.get("annotated", item["frame"]), record)
+
+    def flush_stage(index, emit):
+        pending = list(runtime[index]["pending"])
+        runtime[index]["pending"].clear()
+        selected_items = [item for item in pending if item.pop("selected", False)]
+        if selected_items:
+            run_process_batch(stages[index], selected_items)
+        selected_ids = set(map(id, selected_items))
+        for item in pending:
+            complete(index, item, id(item) in selected_ids)
+            advance(item, index + 1, emit)
+
+    def capture_state(frame_index):
+        return pickle.dumps(
+            {
+                "frame_index": frame_index,
+                "analyzed": progress["analyzed"],
+                "summary_state": dict(summary_state, profile=None),
+                "runtime": [
+                    {"count": state["count"], "last": state["last"]}
+                    for state in runtime
+                ],
+                "stages": {
+                    stage["name"]: stage["save"]()
+                    for stage in stages
+                    if stage["save"] is not None
+                },
+            }
+        )
+
+    def restore_state(state):
+        for key, value in state["summary_state"].items():
+            if key != "profile":
+                summary_state[key] = value
+        for runtime_state, saved in zip(runtime, state["runtime"]):
+            runtime_state.update(saved)
+        for stage in stages:
+            if stage["restore"] is not None and stage["name"] in state["stages"]:
+                stage["restore"](state["stages"][stage["name"]])
+        progress["analyzed"] = state["analyzed"]
+        progress["checkpointed"] = state["analyzed"]
+
+    def checkpoint(item, emit):
+        finish(emit)
+        record = {"checkpoint": build_summary(summary_state)}
+        if checkpoint_state:
+            record["state"] = capture_state(item["frame_index"])
+        emit(None, record)
+        progress["checkpointed"] = progress["analyzed"]
+
+    def consume(item, emit):
+        if item["analyzed"] and not item["warmup"]:
+            analyzed = progress["analyzed"]
+            if (
+                checkpoint_interval
+                and analyzed % checkpoint_interval == 0
+                and analyzed != progress["checkpointed"]
+            ):
+                checkpoint(item, emit)
+            progress["analyzed"] += 1
+        advance(item, parallel_count, emit)
+
+    def finish(emit):
+        for index, stage in enumerate(stages):
+            if stage["process_batch"] is not None:
+                flush_stage(index, emit)
+
+    progress = {"analyzed": 0, "checkpointed": 0}
+    try:
+        if resume_state is not None:
+            restore_state(resume_state)
+        if pipeline_mode == "threaded":
+            run_threaded(
+                frames,
+                prepare,
+                consume,
+                finish,
+                write,
+                worker_count=analysis_workers,
+                decode_queue_size=decode_queue_size,
+                analysis_queue_size=analysis_queue_size,
+                encode_queue_size=encode_queue_size,
+            )
+        else:
+            run_serial(frames, prepare, consume, finish, write)
+    finally:
+        close_stages(stages)
+    return summary_state
@@ -0,0 +1,447 @@
+import json
+import os
+import signal
+import stat
+import threading
+import time
+from collections import Counter, deque
+from functools import partial
+
+import cv2
+import numpy as np
+
+from pipeline.engine import build_summary, write_output
+from pipeline.stages import analyze_video, warm_up_models
+from utils.metadata_sinks import create_metadata_sink
+from utils.profiling import write_profile_report
+from utils.video_io import build_writer_options, create_writer, open_capture
+
+SHED_LEVELS = (
+    (),
+    ("emotions",),
+    ("emotions", "pose"),
+    ("emotions", "pose", "identities", "faces"),
+)
+FOLLOW_POLL_SECONDS = 0.2
+LATENCY_SAMPLES = 10000
+
+
+def resolve_live_input(input_path, mode="auto"):
+    if str(input_path).isdigit():
+        if mode != "auto":
+            raise ValueError(f"--live {mode} requires a video file, not a camera")
+        return "camera", int(input_path)
+    if "://" in str(input_path):
+        return "stream", input_path
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Live input not found: {input_path}")
+    if stat.S_ISFIFO(os.stat(input_path).st_mode):
+        return "stream", input_path
+    return ("replay" if mode == "replay" else "follow"), input_path
+
+
+def create_live_source(capture, kind, target, fps, options):
+    return {
+        "capture": capture,
+        "kind": kind,
+        "target": target,
+        "fps": fps,
+        "options": options,
+        "buffer": deque(),
+        "queue_size": max(1, options["live_queue_size"]),
+        "condition": threading.Condition(),
+        "stop": threading.Event(),
+        "finished": False,
+        "error": None,
+        "captured": 0,
+        "dropped_queue": 0,
+        "dropped_stale": 0,
+    }
+
+
+def reopen_source(source, frame_index):
+    options = source["options"]
+    source["capture"].release()
+    capture = open_capture(
+        source["target"], options["capture_backend"], options["hw_decode"]
+    )
+    capture.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+    source["capture"] = capture
+
+
+def push_frame(source, entry):
+    with source["condition"]:
+        if len(source["buffer"]) >= source["queue_size"]:
+            source["buffer"].popleft()
+            source["dropped_queue"] += 1
+        source["buffer"].append(entry)
+        source["captured"] += 1
+        source["condition"].notify()
+
+
+def capture_frames(source):
+    options = source["options"]
+    frame_step = max(1, options["frame_step"])
+    interval = 1.0 / source["fps"] if source["fps"] else 0.0
+    frame_index = 0
+    idle_since = None
+    started_at = time.perf_counter()
+    while not source["stop"].is_set():
+        read_started = time.perf_counter()
+        success, frame = source["capture"].read()
+        if not success:
+            if source["kind"] != "follow":
+                return
+            now = time.perf_counter()
+            idle_since = idle_since or now
+            if now - idle_since >= options["live_idle_timeout"]:
+                return
+            source["stop"].wait(FOLLOW_POLL_SECONDS)
+            reopen_source(source, frame_index)
+            continue
+        idle_since = None
+        if source["kind"] == "replay" and interval:
+            delay = started_at + frame_index * interval - time.perf_counter()
+            if delay > 0 and source["stop"].wait(delay):
+                return
+        captured_at = time.perf_counter()
+        if frame_index % frame_step == 0:
+            push_frame(
+                source,
+                {
+                    "frame_index": frame_index,
+                    "frame": frame,
+                    "captured_at": captured_at,
+                    "decode_seconds": captured_at - read_started,
+                },
+            )
+        frame_index += 1
+
+
+def run_capture_thread(source):
+    def runner():
+        try:
+            capture_frames(source)
+        except BaseException as error:
+            source["error"] = error
+        finally:
+            with source["condition"]:
+                source["finished"] = True
+                source["condition"].notify_all()
+
+    thread = threading.Thread(target=runner, name="live-capture", daemon=True)
+    thread.start()
+    return thread
+
+
+def take_frame(source, max_age=None):
+    with source["condition"]:
+        buffer = source["buffer"]
+        while not buffer and not source["finished"]:
+            source["condition"].wait()
+        if not buffer:
+            return None
+        if max_age:
+            deadline = time.perf_counter() - max_age
+            while len(buffer) > 1 and buffer[0]["captured_at"] < deadline:
+                buffer.popleft()
+                source["dropped_stale"] += 1
+        return buffer.popleft()
+
+
+def create_load_shedder(budget_ms, levels=SHED_LEVELS, patience=30, settle_frames=0):
+    return {
+        "budget_ms": budget_ms,
+        "levels": levels,
+        "level": 0,
+        "patience": patience,
+        "settle_frames": settle_frames,
+        "settling": 0,
+        "calm_frames": 0,
+        "level_frames": Counter(),
+    }
+
+
+def set_shed_level(shedder, level):
+    level = min(len(shedder["levels"]) - 1, max(0, level))
+    if level != shedder["level"]:
+        shedder["level"] = level
+        shedder["settling"] = shedder["settle_frames"]
+    shedder["calm_frames"] = 0
+
+
+def update_load_shedder(shedder, latency_ms):
+    budget_ms = shedder["budget_ms"]
+    if not budget_ms:
+        return
+    if shedder["settling"]:
+        shedder["settling"] -= 1
+        return
+    if latency_ms > budget_ms:
+        set_shed_level(shedder, shedder["level"] + 1)
+    elif latency_ms < budget_ms * 0.5:
+        shedder["calm_frames"] += 1
+        if shedder["calm_frames"] >= shedder["patience"]:
+            set_shed_level(shedder, shedder["level"] - 1)
+    else:
+        shedder["calm_frames"] = 0
+
+
+def read_live_frames(source, shedder, max_frames=None, profile=False):
+    previous_index = None
+    processed_frames = 0
+    while True:
+        budget_ms = shedder["budget_ms"]
+        entry = take_frame(source, budget_ms / 1000.0 if budget_ms else None)
+        if entry is None:
+            if source["error"] is not None:
+                raise source["error"]
+            return
+        frame_index = entry["frame_index"]
+        level = shedder["level"]
+        shedder["level_frames"][level] += 1
+        frame_gap = 1 if previous_index is None else frame_index - previous_index
+        item = {
+            "frame_index": frame_index,
+            "frame": entry["frame"],
+            "analyzed": True,
+            "warmup": False,
+            "frame_gap": frame_gap,
+            "captured_at": entry["captured_at"],
+            "shed": shedder["levels"][level],
+        }
+        if profile:
+            item["started_at"] = entry["captured_at"] - entry["decode_seconds"]
+            item["timings"] = {"decode": entry["decode_seconds"]}
+        previous_index = frame_index
+        yield item
+        processed_frames += 1
+        if max_frames and processed_frames >= max_frames:
+            return
+
+
+def summarize_latencies(latencies):
+    if not latencies:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    values = np.asarray(latencies, dtype=np.float64)
+    p50, p95 = np.percentile(values, (50, 95))
+    return {
+        "mean": round(float(values.mean()), 3),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+def create_live_report(on_event, interval_seconds, signals=()):
+    return {
+        "on_event": on_event,
+        "signals": list(signals),
+        "interval": interval_seconds,
+        "window_started": time.perf_counter(),
+        "window": create_report_window(),
+        "latencies": deque(maxlen=LATENCY_SAMPLES),
+        "anomaly_events": 0,
+    }
+
+
+def create_report_window():
+    return {
+        "frames": 0,
+        "faces": 0,
+        "anomalies": 0,
+        "emotions": Counter(),
+        "activities": Counter(),
+        "latencies": [],
+    }
+
+
+def record_live_frame(report, record):
+    window = report["window"]
+    window["frames"] += 1
+    window["faces"] += record.get("face_count", 0)
+    window["emotions"].update(record.get("emotions") or [])
+    if "activity" in record:
+        window["activities"].update([record["activity"]])
+    window["latencies"].append(record["latency_ms"])
+    report["latencies"].append(record["latency_ms"])
+    if record.get("is_anomaly"):
+        window["anomalies"] += 1
+        report["anomaly_events"] += 1
+        report["on_event"](
+            {
+                "event": "anomaly",
+                "frame_index": record["frame_index"],
+                "timestamp": record["timestamp"],
+                "wall_time": time.time(),
+                "signals": [
+                    name
+                    for name in report["signals"]
+                    if record.get(f"anomaly_{name}", len(report["signals"]) == 1)
+                ],
+                "face_count": record.get("face_count"),
+                "activity": record.get("activity"),
+                "latency_ms": record["latency_ms"],
+            }
+        )
+
+
+def emit_live_summary(report, source, shedder, force=False):
+    now = time.perf_counter()
+    elapsed = now - report["window_started"]
+    if not force and elapsed < report["interval"]:
+        return
+    window = report["window"]
+    report["on_event"](
+        {
+            "event": "summary",
+            "wall_time": time.time(),
+            "window_seconds": round(elapsed, 3),
+            "frames_processed": window["frames"],
+            "fps": window["frames"] / elapsed if elapsed else 0.0,
+            "faces_detected": window["faces"],
+            "anomalies_detected": window["anomalies"],
+            "emotions": dict(window["emotions"]),
+            "activities": dict(window["activities"]),
+            "latency_ms": summarize_latencies(window["latencies"]),
+            "frames_captured": source["captured"],
+            "frames_dropped": source["dropped_queue"] + source["dropped_stale"],
+            "shed_level": shedder["level"],
+        }
+    )
+    report["window_started"] = now
+    report["window"] = create_report_window()
+
+
+def create_events_writer(events_path, on_event=None):
+    handle = open(events_path, "w", encoding="utf-8")
+
+    def write(event):
+        handle.write(json.dumps(event) + "\n")
+        handle.flush()
+        if on_event is not None:
+            on_event(event)
+
+    return write, handle.close
+
+
+def install_stop_handler(source):
+    if threading.current_thread() is not threading.main_thread():
+        return None
+    return signal.signal(signal.SIGINT, lambda signum, frame: source["stop"].set())
+
+
+def run_live(
+    input_path,
+    output_video_path,
+    metadata_path,
+    events_path,
+    options,
+    write_summary=True,
+    profile_path=None,
+    on_event=None,
+):
+    kind, target = resolve_live_input(input_path, options["live"])
+    capture = open_capture(target, options["capture_backend"], options["hw_decode"])
+    if not capture.isOpened():
+        raise RuntimeError(f"Failed to open live input: {input_path}")
+
+    load_seconds = warm_up_models(options)
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    writer, _ = create_writer(
+        capture, output_video_path, **build_writer_options(options)
+    )
+    sink = create_metadata_sink(
+        metadata_path,
+        metadata_format=options["metadata_format"],
+        buffer_size=options["metadata_buffer"],
+    )
+    write_event, close_events = create_events_writer(events_path, on_event)
+    source = create_live_source(capture, kind, target, fps, options)
+    in_flight = 0
+    if options["pipeline_mode"] == "threaded":
+        in_flight = 2 + options["analysis_workers"]
+    shedder = create_load_shedder(
+        options["latency_budget_ms"], settle_frames=in_flight
+    )
+    report = create_live_report(
+        write_event, options["live_report_interval"], options["anomaly_signals"]
+    )
+    write = partial(write_output, writer, sink)
+
+    def write_live(frame, record):
+        if record is not None and "checkpoint" not in record:
+            update_load_shedder(shedder, record["latency_ms"])
+            record_live_frame(report, record)
+            emit_live_summary(report, source, shedder)
+            if options["summary_only"]:
+                record = None
+        write(frame, record)
+
+    previous_handler = install_stop_handler(source)
+    thread = run_capture_thread(source)
+    started_at = time.perf_counter()
+    summary = None
+    try:
+        summary_state = analyze_video(
+            capture,
+            fps,
+            write_live,
+            dict(
+                options,
+                summary_only=False,
+                decode_queue_size=1,
+                analysis_queue_size=1,
+            ),
+            frames=read_live_frames(
+                source, shedder, options["max_frames"], options["profile"]
+            ),
+        )
+        summary = build_summary(summary_state)
+        emit_live_summary(report, source, shedder, force=True)
+    finally:
+        source["stop"].set()
+        with source["condition"]:
+            source["buffer"].clear()
+        thread.join()
+        source["capture"].release()
+        if previous_handler is not None:
+            signal.signal(signal.SIGINT, previous_handler)
+        sink["close"](summary if write_summary else None)
+        writer.release()
+        close_events()
+    elapsed = time.perf_counter() - started_at
+
+    processed_frames = summary_state["processed_frames"]
+    stats = {
+        "pipeline_mode": options["pipeline_mode"],
+        "frames_processed": processed_frames,
+        "elapsed_seconds": elapsed,
+        "fps": processed_frames / elapsed if elapsed else 0.0,
+        "load_seconds": load_seconds,
+        "summary": summary,
+        "metadata_path": sink["path"],
+        "video_path": output_video_path,
+        "live": {
+            "input": kind,
+            "frames_captured": source["captured"],
+            "frames_dropped": {
+                "queue": source["dropped_queue"],
+                "stale": source["dropped_stale"],
+            },
+            "latency_ms": summarize_latencies(report["latencies"]),
+            "latency_budget_ms": options["latency_budget_ms"],
+            "shed_levels": {
+                "+".join(shedder["levels"][level]) or "none": count
+                for level, count in sorted(shedder["level_frames"].items())
+            },
+            "anomaly_events": report["anomaly_events"],
+            "events_path": events_path,
+        },
+    }
+    if profile_path:
+        write_profile_report(
+            profile_path, summary_state["profile"], processed_frames, elapsed
+        )
+        stats["profile_path"] = profile_path
+    return stats
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+
+from config.settings import DEFAULT_INDEX_BLOCK_SIZE
+from pipeline.engine import (
+    build_summary,
+    create_summary_state,
+    merge_summary_states,
+    restore_summary_state,
+    update_summary,
+)
+from utils.metadata_sinks import write_json_atomic
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".index.json"
+HEAD_BYTES = 1 << 16
+
+
+def hash_head(path, size):
+    with open(path, "rb") as handle:
+        return hashlib.sha256(handle.read(min(size, HEAD_BYTES))).hexdigest()
+
+
+def iter_record_lines(handle, offset, end=None):
+    handle.seek(offset)
+    while end is None or offset < end:
+        line = handle.readline()
+        if not line.endswith(b"\n"):
+            return
+        yield offset, line
+        offset += len(line)
+
+
+def create_block(offset, record):
+    return {
+        "offset": offset,
+        "end": offset,
+        "first_frame": record["frame_index"],
+        "last_frame": record["frame_index"],
+        "first_time": record["timestamp"],
+        "last_time": record["timestamp"],
+        "state": create_summary_state(),
+    }
+
+
+def close_block(block):
+    closed = dict(block)
+    closed["summary"] = build_summary(closed.pop("state"))
+    return closed
+
+
+def scan_blocks(path, offset=0, block_size=DEFAULT_INDEX_BLOCK_SIZE):
+    blocks = []
+    block = None
+    with open(path, "rb") as handle:
+        for line_offset, line in iter_record_lines(handle, offset):
+            record = json.loads(line)
+            if "frame_index" not in record:
+                continue
+            if block is None:
+                block = create_block(line_offset, record)
+            block["end"] = line_offset + len(line)
+            block["last_frame"] = record["frame_index"]
+            block["last_time"] = record["timestamp"]
+            update_summary(block["state"], record)
+            if block["state"]["processed_frames"] >= block_size:
+                blocks.append(close_block(block))
+                block = None
+    if block is not None:
+        blocks.append(close_block(block))
+    return blocks
+
+
+def build_index(path, block_size=DEFAULT_INDEX_BLOCK_SIZE, index=None):
+    stat = os.stat(path)
+    blocks = []
+    offset = 0
+    if index is not None and index["blocks"]:
+        blocks = index["blocks"][:-1]
+        offset = index["blocks"][-1]["offset"]
+    return {
+        "version": INDEX_VERSION,
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "head": hash_head(path, stat.st_size),
+        "block_size": block_size,
+        "blocks": blocks + scan_blocks(path, offset, block_size),
+    }
+
+
+def read_index(index_path):
+    try:
+        with open(index_path, "r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def is_extension(index, path, stat):
+    if stat.st_size <= index["size"]:
+        return False
+    return hash_head(path, index["size"]) == index["head"]
+
+
+def load_index(
+    path, index_path=None, block_size=DEFAULT_INDEX_BLOCK_SIZE, rebuild=False
+):
+    index_path = index_path or path + INDEX_SUFFIX
+    index = None if rebuild else read_index(index_path)
+    stat = os.stat(path)
+    if index is not None and (
+        index.get("version") != INDEX_VERSION or index["block_size"] != block_size
+    ):
+        index = None
+    if index is not None:
+        if stat.st_size == index["size"] and stat.st_mtime_ns == index["mtime_ns"]:
+            index["status"] = "reused"
+            return index
+        if not is_extension(index, path, stat):
+            index = None
+    status = "extended" if index is not None else "built"
+    index = build_index(path, block_size=block_size, index=index)
+    write_json_atomic(index_path, index)
+    index["status"] = status
+    return index
+
+
+def block_bounds(block, key):
+    if key == "timestamp":
+        return block["first_time"], block["last_time"]
+    return block["first_frame"], block["last_frame"]
+
+
+def in_window(value, start=None, end=None):
+    return (start is None or value >= start) and (end is None or value < end)
+
+
+def select_blocks(index, key="timestamp", start=None, end=None):
+    for block in index["blocks"]:
+        first, last = block_bounds(block, key)
+        if (end is not None and first >= end) or (start is not None and last < start):
+            continue
+        covered = in_window(first, start, end) and in_window(last, start, end)
+        yield block, covered
+
+
+def iter_block_records(path, block, key="timestamp", start=None, end=None):
+    with open(path, "rb") as handle:
+        for _, line in iter_record_lines(handle, block["offset"], block["end"]):
+            record = json.loads(line)
+            if "frame_index" in record and in_window(record[key], start, end):
+                yield record
+
+
+def iter_records(path, index, key="timestamp", start=None, end=None):
+    for block, _ in select_blocks(index, key, start, end):
+        yield from iter_block_records(path, block, key, start, end)
+
+
+def aggregate_window(path, index, key="timestamp", start=None, end=None, top_k=3):
+    states = []
+    partial = create_summary_state()
+    for block, covered in select_blocks(index, key, start, end):
+        if covered:
+            states.append(restore_summary_state(block["summary"]))
+            continue
+        for record in iter_block_records(path, block, key, start, end):
+            update_summary(partial, record)
+    states.append(partial)
+    return build_summary(merge_summary_states(states), top_k=top_k)
+
+
+def build_timeline(path, index, bucket, key="timestamp", start=None, end=None, top_k=3):
+    if not index["blocks"]:
+        return []
+    first, _ = block_bounds(index["blocks"][0], key)
+    _, last = block_bounds(index["blocks"][-1], key)
+    position = first if start is None else max(start, first)
+    buckets = []
+    while position <= last and (end is None or position < end):
+        bucket_end = position + bucket if end is None else min(position + bucket, end)
+        summary = aggregate_window(path, index, key, position, bucket_end, top_k)
+        buckets.append({"start": position, "end": bucket_end, "summary": summary})
+        position = bucket_end
+    return buckets
+
+
+def top_labels(path, index, field, key="timestamp", start=None, end=None, top_k=5):
+    summary = aggregate_window(path, index, key, start, end, top_k=top_k)
+    if field == "identities":
+        identities = summary.get("identities", {})
+        ranked = sorted(
+            identities.items(), key=lambda entry: (-entry[1]["frames"], entry[0])
+        )
+        return [
+            {
+                "label": identity,
+                "count": stats["frames"],
+                "anomalies": stats["anomalies"],
+            }
+            for identity, stats in ranked[:top_k]
+        ]
+    return summary[f"top_{field}"]
+
+
+def anomaly_signals(record):
+    return [
+        key[len("anomaly_") :]
+        for key, value in record.items()
+        if key.startswith("anomaly_") and value is True
+    ]
+
+
+def list_anomalies(
+    path, index, key="timestamp", start=None, end=None, identity=None, limit=None
+):
+    count = 0
+    for block, _ in select_blocks(index, key, start, end):
+        if not block["summary"]["anomalies_detected"]:
+            continue
+        if identity is not None:
+            stats = block["summary"].get("identities", {}).get(identity)
+            if not stats or not stats["anomalies"]:
+                continue
+        for record in iter_block_records(path, block, key, start, end):
+            if not record.get("is_anomaly"):
+                continue
+            identities = record.get("identities") or []
+            if identity is not None and identity not in identities:
+                continue
+            yield {
+                "frame_index": record["frame_index"],
+                "timestamp": record["timestamp"],
+                "signals": anomaly_signals(record),
+                "face_count": record.get("face_count"),
+                "identities": record.get("identities"),
+                "activity": record.get("activity"),
+                "motion_score": record.get("motion_score"),
+            }
+            count += 1
+            if limit and count >= limit:
+                return
@@ -0,0 +1,12 @@
+import importlib
+
+PIPELINES = {
+    "full": ("pipeline.run_full_analysis", "run_full_analysis"),
+    "emotions": ("pipeline.run_emotion_analysis", "run_emotion_analysis"),
+    "faces": ("pipeline.run_face_recognition", "run_face_recognition"),
+}
+
+
+def load_pipeline(name):
+    module_name, function_name = PIPELINES[name]
+    return getattr(importlib.import_module(module_name), function_name)
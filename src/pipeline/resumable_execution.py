@@ -0,0 +1,164 @@
+import json
+import os
+import pickle
+import shutil
+
+from pipeline.segmented_execution import (
+    concat_metadata_parts,
+    concat_video_chunks,
+    convert_metadata_parts,
+    count_frames,
+)
+from utils.metadata_sinks import create_jsonl_sink, create_metadata_sink
+from utils.video_io import build_writer_options, create_writer
+
+RESUME_DIR = ".resume"
+CHECKPOINT_FILE = "checkpoint.pkl"
+RESUME_IGNORED_OPTIONS = (
+    "pipeline_mode",
+    "analysis_workers",
+    "decode_queue_size",
+    "analysis_queue_size",
+    "encode_queue_size",
+    "workers",
+    "segment_warmup",
+    "metadata_format",
+    "metadata_buffer",
+    "checkpoint_interval",
+    "profile",
+    "profile_frames",
+    "resume",
+    "cache",
+    "cache_dir",
+    "cache_size_mb",
+    "video_hash",
+    "decode_strategy",
+    "keyframe_interval",
+)
+
+
+def build_resume_key(input_path, options):
+    stat = os.stat(input_path)
+    return json.dumps(
+        {
+            "input": os.path.abspath(input_path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "options": {
+                key: value
+                for key, value in options.items()
+                if key not in RESUME_IGNORED_OPTIONS
+            },
+        },
+        sort_keys=True,
+        default=str,
+    )
+
+
+def build_chunk_paths(resume_dir, chunk_index):
+    return (
+        os.path.join(resume_dir, f"chunk_{chunk_index:04d}.mp4"),
+        os.path.join(resume_dir, f"metadata_{chunk_index:04d}.jsonl"),
+    )
+
+
+def load_checkpoint(resume_dir, resume_key):
+    checkpoint_path = os.path.join(resume_dir, CHECKPOINT_FILE)
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path, "rb") as checkpoint_handle:
+        checkpoint = pickle.load(checkpoint_handle)
+    if checkpoint["resume_key"] != resume_key:
+        raise ValueError(
+            f"Checkpoint in {resume_dir} was written for a different input or "
+            "analysis options; run without --resume to start over"
+        )
+    return checkpoint
+
+
+def save_checkpoint(resume_dir, checkpoint):
+    checkpoint_path = os.path.join(resume_dir, CHECKPOINT_FILE)
+    temp_path = checkpoint_path + ".tmp"
+    with open(temp_path, "wb") as checkpoint_handle:
+        pickle.dump(checkpoint, checkpoint_handle)
+    os.replace(temp_path, checkpoint_path)
+
+
+def open_resumable_output(capture, input_path, output_dir, options):
+    resume_dir = os.path.join(output_dir, RESUME_DIR)
+    resume_key = build_resume_key(input_path, options)
+    checkpoint = load_checkpoint(resume_dir, resume_key) if options["resume"] else None
+    if checkpoint is None:
+        shutil.rmtree(resume_dir, ignore_errors=True)
+    os.makedirs(resume_dir, exist_ok=True)
+
+    output = {
+        "resume_dir": resume_dir,
+        "chunk_index": checkpoint["chunk_index"] if checkpoint else 0,
+        "state": pickle.loads(checkpoint["state"]) if checkpoint else None,
+        "writer": None,
+        "sink": None,
+    }
+
+    def open_chunk():
+        video_path, metadata_path = build_chunk_paths(resume_dir, output["chunk_index"])
+        output["writer"], _ = create_writer(
+            capture,
+            None if options["no_video"] else video_path,
+            **build_writer_options(options),
+        )
+        output["sink"] = create_jsonl_sink(
+            metadata_path, buffer_size=max(1, options["metadata_buffer"])
+        )
+
+    def close_chunk():
+        output["sink"]["close"]()
+        output["writer"].release()
+
+    def write(frame, record):
+        if frame is not None:
+            output["writer"].write(frame)
+        if record is None:
+            return
+        if "checkpoint" not in record:
+            output["sink"]["write"](record)
+            return
+        output["sink"]["checkpoint"](record["checkpoint"])
+        if "state" in record:
+            close_chunk()
+            output["chunk_index"] += 1
+            save_checkpoint(
+                resume_dir,
+                {
+                    "resume_key": resume_key,
+                    "chunk_index": output["chunk_index"],
+                    "state": record["state"],
+                },
+            )
+            open_chunk()
+
+    open_chunk()
+    output["write"] = write
+    output["close"] = close_chunk
+    return output
+
+
+def finalize_resumable_output(
+    output, input_path, output_video_path, metadata_path, options, summary=None
+):
+    chunk_paths = []
+    part_paths = []
+    for chunk_index in range(output["chunk_index"] + 1):
+        video_path, part_path = build_chunk_paths(output["resume_dir"], chunk_index)
+        if output_video_path is not None and count_frames(video_path) > 0:
+            chunk_paths.append(video_path)
+        part_paths.append(part_path)
+    if output_video_path is not None:
+        concat_video_chunks(input_path, chunk_paths, output_video_path, options)
+    if options["metadata_format"] == "jsonl":
+        metadata_path = concat_metadata_parts(part_paths, metadata_path, summary)
+    else:
+        sink = create_metadata_sink(metadata_path, options["metadata_format"])
+        metadata_path = convert_metadata_parts(part_paths, sink, summary)
+    shutil.rmtree(output["resume_dir"], ignore_errors=True)
+    return metadata_path
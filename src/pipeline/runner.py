@@ -0,0 +1,328 @@
+import os
+import time
+from functools import partial
+
+import cv2
+
+from config.settings import (
+    DEFAULT_ACTIVITY_WINDOW,
+    DEFAULT_ANALYSIS_QUEUE_SIZE,
+    DEFAULT_ANALYSIS_WORKERS,
+    DEFAULT_ANOMALY_ESTIMATOR,
+    DEFAULT_ANOMALY_METHOD,
+    DEFAULT_ANOMALY_MIN_MOTION,
+    DEFAULT_ANOMALY_SIGNALS,
+    DEFAULT_ANOMALY_THRESHOLD,
+    DEFAULT_ANOMALY_WINDOW,
+    DEFAULT_CACHE_DIR,
+    DEFAULT_CACHE_SIZE_MB,
+    DEFAULT_CHECKPOINT_INTERVAL,
+    DEFAULT_DECODE_QUEUE_SIZE,
+    DEFAULT_DECODE_STRATEGY,
+    DEFAULT_CAPTURE_BACKEND,
+    DEFAULT_CLUSTER_TOLERANCE,
+    DEFAULT_DETECT_INTERVAL,
+    DEFAULT_DETECTION_STRATEGY,
+    DEFAULT_EMOTION_BATCH_SIZE,
+    DEFAULT_EMOTION_REFRESH,
+    DEFAULT_ENCODE_CRF,
+    DEFAULT_ENCODE_PRESET,
+    DEFAULT_ENCODE_QUEUE_SIZE,
+    DEFAULT_FACE_FALLBACK,
+    DEFAULT_FACE_MIN_CONFIDENCE,
+    DEFAULT_FACE_MODEL,
+    DEFAULT_FACE_RANGE,
+    DEFAULT_FACE_PADDING,
+    DEFAULT_FULL_SCAN_INTERVAL,
+    DEFAULT_HAAR_NEIGHBORS,
+    DEFAULT_HAAR_SCALE,
+    DEFAULT_IDENTITY_TOLERANCE,
+    DEFAULT_KEYFRAME_INTERVAL,
+    DEFAULT_LATENCY_BUDGET_MS,
+    DEFAULT_LIVE_EVENTS_FILE,
+    DEFAULT_LIVE_IDLE_TIMEOUT,
+    DEFAULT_LIVE_QUEUE_SIZE,
+    DEFAULT_LIVE_REPORT_INTERVAL,
+    DEFAULT_METADATA_BUFFER,
+    DEFAULT_METADATA_FORMAT,
+    DEFAULT_MIN_FACE_SIZE,
+    DEFAULT_MOTION_HIGH,
+    DEFAULT_MOTION_LOW,
+    DEFAULT_PIPELINE_MODE,
+    DEFAULT_POSE_MIN_VISIBILITY,
+    DEFAULT_PROFILE_FILE,
+    DEFAULT_ROI_COARSE_WIDTH,
+    DEFAULT_ROI_MARGIN,
+    DEFAULT_ROI_MOTION_THRESHOLD,
+    DEFAULT_ROI_SOURCE,
+    DEFAULT_SAMPLE_MAX_STEP,
+    DEFAULT_SAMPLE_MIN_STEP,
+    DEFAULT_SAMPLING,
+    DEFAULT_SEGMENT_WARMUP,
+    DEFAULT_TRACK_MIN_CONFIDENCE,
+    DEFAULT_UPSAMPLE,
+    DEFAULT_VIDEO_BACKEND,
+)
+from pipeline.engine import build_summary, write_output
+from pipeline.live_execution import run_live
+from pipeline.resumable_execution import (
+    finalize_resumable_output,
+    open_resumable_output,
+)
+from pipeline.segmented_execution import run_segmented
+from pipeline.stages import FULL_ANALYSIS_STAGES, analyze_video, warm_up_models
+from utils.metadata_sinks import create_metadata_sink
+from utils.profiling import write_profile_report
+from utils.result_cache import evict_cache, hash_input
+from utils.video_io import (
+    build_output_paths,
+    build_writer_options,
+    create_writer,
+    open_capture,
+)
+
+OPTION_DEFAULTS = {
+    "stages": FULL_ANALYSIS_STAGES,
+    "skip_stages": (),
+    "stage_order": None,
+    "stage_every": None,
+    "frame_step": 1,
+    "sampling": DEFAULT_SAMPLING,
+    "sample_min_step": DEFAULT_SAMPLE_MIN_STEP,
+    "sample_max_step": DEFAULT_SAMPLE_MAX_STEP,
+    "target_fps": None,
+    "motion_low": DEFAULT_MOTION_LOW,
+    "motion_high": DEFAULT_MOTION_HIGH,
+    "carry_annotations": False,
+    "interpolate_boxes": False,
+    "activity_window": DEFAULT_ACTIVITY_WINDOW,
+    "pose_min_visibility": DEFAULT_POSE_MIN_VISIBILITY,
+    "anomaly_signals": DEFAULT_ANOMALY_SIGNALS,
+    "anomaly_method": DEFAULT_ANOMALY_METHOD,
+    "anomaly_estimator": DEFAULT_ANOMALY_ESTIMATOR,
+    "anomaly_window": DEFAULT_ANOMALY_WINDOW,
+    "anomaly_threshold": DEFAULT_ANOMALY_THRESHOLD,
+    "anomaly_min_motion": DEFAULT_ANOMALY_MIN_MOTION,
+    "max_frames": None,
+    "resize_width": None,
+    "face_model": DEFAULT_FACE_MODEL,
+    "upsample": DEFAULT_UPSAMPLE,
+    "face_fallback": DEFAULT_FACE_FALLBACK,
+    "haar_scale": DEFAULT_HAAR_SCALE,
+    "haar_neighbors": DEFAULT_HAAR_NEIGHBORS,
+    "summary_only": True,
+    "min_face_size": DEFAULT_MIN_FACE_SIZE,
+    "face_min_confidence": DEFAULT_FACE_MIN_CONFIDENCE,
+    "face_range": DEFAULT_FACE_RANGE,
+    "face_padding": DEFAULT_FACE_PADDING,
+    "emotion_batch_size": DEFAULT_EMOTION_BATCH_SIZE,
+    "face_tracking": False,
+    "detect_interval": DEFAULT_DETECT_INTERVAL,
+    "track_min_confidence": DEFAULT_TRACK_MIN_CONFIDENCE,
+    "emotion_refresh": DEFAULT_EMOTION_REFRESH,
+    "detection_strategy": DEFAULT_DETECTION_STRATEGY,
+    "roi_source": DEFAULT_ROI_SOURCE,
+    "roi_coarse_width": DEFAULT_ROI_COARSE_WIDTH,
+    "roi_margin": DEFAULT_ROI_MARGIN,
+    "roi_motion_threshold": DEFAULT_ROI_MOTION_THRESHOLD,
+    "full_scan_interval": DEFAULT_FULL_SCAN_INTERVAL,
+    "gallery": None,
+    "gallery_cache": None,
+    "identity_tolerance": DEFAULT_IDENTITY_TOLERANCE,
+    "cluster_unknown": False,
+    "cluster_tolerance": DEFAULT_CLUSTER_TOLERANCE,
+    "pipeline_mode": DEFAULT_PIPELINE_MODE,
+    "analysis_workers": DEFAULT_ANALYSIS_WORKERS,
+    "decode_queue_size": DEFAULT_DECODE_QUEUE_SIZE,
+    "analysis_queue_size": DEFAULT_ANALYSIS_QUEUE_SIZE,
+    "encode_queue_size": DEFAULT_ENCODE_QUEUE_SIZE,
+    "workers": 1,
+    "segment_warmup": DEFAULT_SEGMENT_WARMUP,
+    "profile": False,
+    "profile_frames": False,
+    "metadata_format": DEFAULT_METADATA_FORMAT,
+    "metadata_buffer": DEFAULT_METADATA_BUFFER,
+    "checkpoint_interval": DEFAULT_CHECKPOINT_INTERVAL,
+    "resume": False,
+    "cache": False,
+    "cache_dir": DEFAULT_CACHE_DIR,
+    "cache_size_mb": DEFAULT_CACHE_SIZE_MB,
+    "capture_backend": DEFAULT_CAPTURE_BACKEND,
+    "hw_decode": False,
+    "decode_strategy": DEFAULT_DECODE_STRATEGY,
+    "keyframe_interval": DEFAULT_KEYFRAME_INTERVAL,
+    "video_backend": DEFAULT_VIDEO_BACKEND,
+    "video_codec": None,
+    "encode_preset": DEFAULT_ENCODE_PRESET,
+    "encode_crf": DEFAULT_ENCODE_CRF,
+    "no_video": False,
+    "live": None,
+    "latency_budget_ms": DEFAULT_LATENCY_BUDGET_MS,
+    "live_queue_size": DEFAULT_LIVE_QUEUE_SIZE,
+    "live_report_interval": DEFAULT_LIVE_REPORT_INTERVAL,
+    "live_idle_timeout": DEFAULT_LIVE_IDLE_TIMEOUT,
+}
+
+
+def resolve_options(options):
+    unknown = sorted(set(options) - set(OPTION_DEFAULTS))
+    if unknown:
+        raise TypeError(f"Unknown pipeline option(s): {', '.join(unknown)}")
+    resolved = dict(OPTION_DEFAULTS)
+    resolved.update({key: value for key, value in options.items() if value is not None})
+    return resolved
+
+
+def warm_up(**options):
+    return warm_up_models(resolve_options(options))
+
+
+def evict_result_cache(options):
+    if options["cache"]:
+        evict_cache(options["cache_dir"], options["cache_size_mb"] * 1024 * 1024)
+
+
+def run_pipeline(
+    input_path,
+    output_dir,
+    output_video,
+    metadata_file,
+    write_summary=True,
+    on_event=None,
+    **options,
+):
+    resolved = resolve_options(options)
+    if not resolved["live"] and not os.path.exists(input_path):
+        raise FileNotFoundError(f"Input video not found: {input_path}")
+
+    output_video_path, metadata_path = build_output_paths(
+        output_dir, output_video, metadata_file
+    )
+    if resolved["no_video"]:
+        output_video_path = None
+    profile_path = None
+    if resolved["profile"] or resolved["profile_frames"]:
+        resolved["profile"] = True
+        profile_path = os.path.join(output_dir, DEFAULT_PROFILE_FILE)
+    if resolved["live"]:
+        if resolved["workers"] > 1:
+            raise ValueError("--live is not supported with --workers")
+        if resolved["checkpoint_interval"] or resolved["resume"] or resolved["cache"]:
+            raise ValueError(
+                "--live is not supported with --checkpoint-interval, --resume "
+                "or --cache"
+            )
+        return run_live(
+            input_path,
+            output_video_path,
+            metadata_path,
+            os.path.join(output_dir, DEFAULT_LIVE_EVENTS_FILE),
+            resolved,
+            write_summary=write_summary,
+            profile_path=profile_path,
+            on_event=on_event,
+        )
+    if resolved["cache"]:
+        resolved["video_hash"] = hash_input(input_path, resolved["cache_dir"])
+    if resolved["resume"] and not resolved["checkpoint_interval"]:
+        raise ValueError("--resume requires --checkpoint-interval")
+    if resolved["workers"] > 1:
+        if resolved["resume"]:
+            raise ValueError("--resume is not supported with --workers")
+        if resolved["sampling"] == "adaptive":
+            raise ValueError("--sampling adaptive is not supported with --workers")
+        stats = run_segmented(
+            input_path,
+            output_video_path,
+            metadata_path,
+            resolved,
+            resolved["workers"],
+            segment_warmup=resolved["segment_warmup"],
+            write_summary=write_summary,
+            profile_path=profile_path,
+        )
+        evict_result_cache(resolved)
+        return stats
+
+    capture = open_capture(
+        input_path, resolved["capture_backend"], resolved["hw_decode"]
+    )
+    if not capture.isOpened():
+        raise RuntimeError(f"Failed to open video: {input_path}")
+
+    load_seconds = warm_up_models(resolved)
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    resumable = None
+    resume_state = None
+    if resolved["checkpoint_interval"]:
+        resumable = open_resumable_output(capture, input_path, output_dir, resolved)
+        resume_state = resumable["state"]
+        write = resumable["write"]
+    else:
+        writer, _ = create_writer(
+            capture, output_video_path, **build_writer_options(resolved)
+        )
+        sink = create_metadata_sink(
+            metadata_path,
+            metadata_format=resolved["metadata_format"],
+            buffer_size=resolved["metadata_buffer"],
+        )
+        write = partial(write_output, writer, sink)
+    started_at = time.perf_counter()
+    summary = None
+    try:
+        summary_state = analyze_video(
+            capture,
+            fps,
+            write,
+            resolved,
+            checkpoint_state=resumable is not None,
+            resume_state=resume_state,
+        )
+        summary = build_summary(summary_state)
+    finally:
+        capture.release()
+        if resumable is not None:
+            resumable["close"]()
+        else:
+            sink["close"](summary if write_summary else None)
+            writer.release()
+    if resumable is not None:
+        metadata_path = finalize_resumable_output(
+            resumable,
+            input_path,
+            output_video_path,
+            metadata_path,
+            resolved,
+            summary if write_summary else None,
+        )
+    else:
+        metadata_path = sink["path"]
+    elapsed = time.perf_counter() - started_at
+    evict_result_cache(resolved)
+
+    processed_frames = summary_state["processed_frames"]
+    resumed_frames = resume_state["analyzed"] if resume_state else 0
+    run_frames = processed_frames - resumed_frames
+    stats = {
+        "pipeline_mode": resolved["pipeline_mode"],
+        "frames_processed": processed_frames,
+        "elapsed_seconds": elapsed,
+        "fps": run_frames / elapsed if elapsed else 0.0,
+        "load_seconds": load_seconds,
+        "summary": summary,
+        "metadata_path": metadata_path,
+        "video_path": output_video_path,
+    }
+    if resolved["cache"]:
+        stats["cache"] = summary_state["cache"]
+    if "sampling" in summary_state:
+        stats["sampling"] = summary_state["sampling"]
+    if resume_state:
+        stats["resumed_from_frame"] = resume_state["frame_index"]
+    if profile_path:
+        write_profile_report(
+            profile_path, summary_state["profile"], run_frames, elapsed
+        )
+        stats["profile_path"] = profile_path
+    return stats
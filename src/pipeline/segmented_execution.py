@@ -0,0 +1,237 @@
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import cv2
+
+from pipeline.engine import build_summary, merge_summary_states, write_output
+from pipeline.stages import analyze_video, warm_up_models
+from utils.metadata_sinks import create_jsonl_sink, create_metadata_sink
+from utils.profiling import write_profile_report
+from utils.video_io import build_writer_options, create_writer, open_capture
+
+TRACK_ID_STRIDE = 1000000
+
+
+def count_frames(input_path):
+    capture = cv2.VideoCapture(input_path)
+    total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    capture.release()
+    return total_frames
+
+
+def align_to_step(frame_index, frame_step):
+    return -(-frame_index // frame_step) * frame_step
+
+
+def plan_segments(total_frames, workers, frame_step=1, max_frames=None, warmup=60):
+    step = max(1, frame_step)
+    end_frame = None
+    if max_frames:
+        end_frame = (max_frames - 1) * step + 1
+        if total_frames > 0:
+            end_frame = min(end_frame, total_frames)
+        total_frames = end_frame
+    if total_frames <= 0:
+        return [{"index": 0, "start": 0, "end": end_frame, "warmup_start": 0}]
+
+    size = align_to_step(-(-total_frames // max(1, workers)), step)
+    segments = []
+    start = 0
+    while start < total_frames:
+        segments.append(
+            {
+                "index": len(segments),
+                "start": start,
+                "end": start + size,
+                "warmup_start": max(0, start - warmup * step),
+            }
+        )
+        start += size
+    segments[-1]["end"] = end_frame
+    return segments
+
+
+def run_segment(input_path, chunk_path, metadata_path, options, segment):
+    capture = open_capture(input_path, options["capture_backend"], options["hw_decode"])
+    if not capture.isOpened():
+        raise RuntimeError(f"Failed to open video: {input_path}")
+
+    load_seconds = warm_up_models(options)
+    writer, fps = create_writer(
+        capture,
+        None if options["no_video"] else chunk_path,
+        **build_writer_options(options),
+    )
+    segment_options = dict(
+        options,
+        max_frames=None,
+        checkpoint_interval=0,
+        track_id_offset=segment["index"] * TRACK_ID_STRIDE,
+    )
+    sink = create_jsonl_sink(metadata_path, buffer_size=options["metadata_buffer"])
+    try:
+        summary_state = analyze_video(
+            capture,
+            fps,
+            partial(write_output, writer, sink),
+            segment_options,
+            start_frame=segment["warmup_start"],
+            end_frame=segment["end"],
+            emit_from=segment["start"],
+        )
+    finally:
+        sink["close"]()
+        capture.release()
+        writer.release()
+    summary_state["load_seconds"] = load_seconds
+    return summary_state
+
+
+def concat_with_ffmpeg(chunk_paths, output_path):
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return False
+    list_path = output_path + ".segments.txt"
+    with open(list_path, "w", encoding="utf-8") as list_handle:
+        for chunk_path in chunk_paths:
+            list_handle.write(f"file '{os.path.abspath(chunk_path)}'\n")
+    result = subprocess.run(
+        [
+            ffmpeg,
+            "-y",
+            "-loglevel",
+            "error",
+            "-f",
+            "concat",
+            "-safe",
+            "0",
+            "-i",
+            list_path,
+            "-c",
+            "copy",
+            output_path,
+        ],
+        check=False,
+    )
+    os.remove(list_path)
+    return result.returncode == 0
+
+
+def concat_video_chunks(input_path, chunk_paths, output_path, options):
+    if concat_with_ffmpeg(chunk_paths, output_path):
+        return
+    capture = cv2.VideoCapture(input_path)
+    writer, _ = create_writer(capture, output_path, **build_writer_options(options))
+    capture.release()
+    for chunk_path in chunk_paths:
+        chunk = cv2.VideoCapture(chunk_path)
+        while True:
+            success, frame = chunk.read()
+            if not success:
+                break
+            writer.write(frame)
+        chunk.release()
+    writer.release()
+
+
+def concat_metadata_parts(part_paths, metadata_path, summary=None):
+    with open(metadata_path, "w", encoding="utf-8") as metadata_handle:
+        for part_path in part_paths:
+            with open(part_path, "r", encoding="utf-8") as part_handle:
+                shutil.copyfileobj(part_handle, metadata_handle)
+        if summary is not None:
+            metadata_handle.write(json.dumps({"summary": summary}) + "\n")
+    return metadata_path
+
+
+def convert_metadata_parts(part_paths, sink, summary=None):
+    for part_path in part_paths:
+        with open(part_path, "r", encoding="utf-8") as part_handle:
+            for line in part_handle:
+                record = json.loads(line)
+                if "checkpoint" not in record:
+                    sink["write"](record)
+    sink["close"](summary)
+    return sink["path"]
+
+
+def run_segmented(
+    input_path,
+    output_video_path,
+    metadata_path,
+    options,
+    workers,
+    segment_warmup=60,
+    write_summary=True,
+    profile_path=None,
+):
+    segments = plan_segments(
+        count_frames(input_path),
+        workers,
+        frame_step=options["frame_step"],
+        max_frames=options["max_frames"],
+        warmup=max(segment_warmup, options["anomaly_window"]),
+    )
+    segments_dir = os.path.join(os.path.dirname(metadata_path), ".segments")
+    os.makedirs(segments_dir, exist_ok=True)
+    chunk_paths = [
+        os.path.join(segments_dir, f"chunk_{segment['index']:04d}.mp4")
+        for segment in segments
+    ]
+    part_paths = [
+        os.path.join(segments_dir, f"metadata_{segment['index']:04d}.jsonl")
+        for segment in segments
+    ]
+
+    started_at = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(segments)),
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as executor:
+        futures = [
+            executor.submit(
+                run_segment, input_path, chunk_path, part_path, options, segment
+            )
+            for segment, chunk_path, part_path in zip(segments, chunk_paths, part_paths)
+        ]
+        summary_state = merge_summary_states(future.result() for future in futures)
+
+    if output_video_path is not None:
+        concat_video_chunks(input_path, chunk_paths, output_video_path, options)
+    summary = build_summary(summary_state)
+    final_summary = summary if write_summary else None
+    if options["metadata_format"] == "jsonl":
+        metadata_path = concat_metadata_parts(part_paths, metadata_path, final_summary)
+    else:
+        sink = create_metadata_sink(metadata_path, options["metadata_format"])
+        metadata_path = convert_metadata_parts(part_paths, sink, final_summary)
+    shutil.rmtree(segments_dir, ignore_errors=True)
+    elapsed = time.perf_counter() - started_at
+
+    processed_frames = summary_state["processed_frames"]
+    stats = {
+        "pipeline_mode": options["pipeline_mode"],
+        "workers": workers,
+        "segments": len(segments),
+        "frames_processed": processed_frames,
+        "elapsed_seconds": elapsed,
+        "fps": processed_frames / elapsed if elapsed else 0.0,
+        "load_seconds": summary_state["load_seconds"],
+        "summary": summary,
+        "metadata_path": metadata_path,
+        "video_path": output_video_path,
+    }
+    if options["cache"]:
+        stats["cache"] = summary_state["cache"]
+    if profile_path:
+        write_profile_report(
+            profile_path, summary_state["profile"], processed_frames, elapsed
+        )
+        stats["profile_path"] = profile_path
+    return stats
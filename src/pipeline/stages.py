@@ -0,0 +1,746 @@
+import threading
+import time
+from functools import partial
+
+from modules.activity_detection_module import (
+    acquire_pose,
+    create_activity_state,
+    detect_activity,
+    draw_activity,
+    release_activity_state,
+    release_pose,
+    restore_activity_state,
+    save_activity_state,
+)
+from modules.anomaly_detection_module import (
+    create_anomaly_detector,
+    detect_anomalies,
+    restore_anomaly_detector,
+    save_anomaly_detector,
+)
+from modules.emotion_analysis_module import (
+    analyze_emotions_batch,
+    create_emotion_engine,
+    draw_emotions,
+    load_deepface,
+    load_emotion_model,
+)
+from modules.face_identity_module import (
+    assign_unknown,
+    compute_face_encodings,
+    create_empty_gallery,
+    create_unknown_clusters,
+    draw_identities,
+    load_gallery,
+    match_encodings,
+    restore_unknown_clusters,
+    save_unknown_clusters,
+)
+from modules.face_recognition_module import (
+    close_face_detector,
+    close_haar_detector,
+    create_face_detector,
+    create_haar_detector,
+    create_roi_state,
+    detect_faces,
+    detect_faces_roi,
+    draw_face_boxes,
+    load_face_recognition,
+    scale_boxes,
+    warm_up_face_detector,
+)
+from modules.face_tracking_module import (
+    create_tracking_state,
+    interpolate_boxes,
+    reset_emotion_refresh,
+    resolve_track_emotions,
+    select_emotion_refresh,
+    track_faces,
+)
+from pipeline.engine import (
+    close_stages,
+    create_stage,
+    read_frames,
+    run_engine,
+    select_stage_names,
+    validate_stages,
+)
+from utils.frame_context import get_gray, get_resized, get_scale
+from utils.frame_sampling import create_adaptive_sampler, summarize_sampler
+from utils.result_cache import (
+    build_params_key,
+    cache_get,
+    cache_put,
+    close_result_cache,
+    create_result_cache,
+)
+
+FULL_ANALYSIS_STAGES = (
+    "faces",
+    "identities",
+    "activity",
+    "emotions",
+    "anomaly",
+    "annotate",
+)
+EMOTION_ANALYSIS_STAGES = ("faces", "identities", "emotions", "annotate")
+FACE_RECOGNITION_STAGES = ("faces", "identities", "annotate")
+DETECTION_CACHE_PARAMS = (
+    "face_model",
+    "upsample",
+    "face_fallback",
+    "haar_scale",
+    "haar_neighbors",
+    "min_face_size",
+    "face_min_confidence",
+    "face_range",
+    "resize_width",
+)
+EMOTION_CACHE_PARAMS = DETECTION_CACHE_PARAMS + (
+    "face_padding",
+    "emotion_batch_size",
+)
+PIPELINE_STAGES = {
+    "full": FULL_ANALYSIS_STAGES,
+    "emotions": EMOTION_ANALYSIS_STAGES,
+    "faces": FACE_RECOGNITION_STAGES,
+}
+
+
+def build_detection_options(options):
+    return {
+        "model": options["face_model"],
+        "upsample": options["upsample"],
+        "fallback": options["face_fallback"],
+        "haar_scale": options["haar_scale"],
+        "haar_neighbors": options["haar_neighbors"],
+        "min_size": options["min_face_size"],
+        "min_confidence": options["face_min_confidence"],
+        "face_range": options["face_range"],
+    }
+
+
+def uses_detection_history(options):
+    return options["face_tracking"] or options["detection_strategy"] == "roi"
+
+
+def feeds_anomaly_signals(options, signals):
+    if "anomaly" not in resolve_stage_names(options):
+        return False
+    return any(name in options["anomaly_signals"] for name in signals)
+
+
+def carry_faces(stage, item, last):
+    item["boxes"] = list(last["boxes"] or [])
+    item["tracks"] = last["tracks"]
+    item["track_ids"] = (
+        None if last["track_ids"] is None else list(last["track_ids"])
+    )
+    item["emotion_needed"] = [False] * len(item["boxes"])
+
+
+def create_face_stage(options):
+    detection_options = build_detection_options(options)
+    tracking_state = None
+    if options["face_tracking"]:
+        tracking_state = create_tracking_state(
+            detect_interval=options["detect_interval"],
+            min_confidence=options["track_min_confidence"],
+            emotion_refresh=options["emotion_refresh"],
+        )
+        tracking_state["next_id"] += options.get("track_id_offset", 0)
+    roi_state = None
+    if options["detection_strategy"] == "roi":
+        roi_state = create_roi_state(
+            full_scan_interval=options["full_scan_interval"],
+            source=options["roi_source"],
+            coarse_width=options["roi_coarse_width"],
+            margin=options["roi_margin"],
+            motion_threshold=options["roi_motion_threshold"],
+        )
+    stateful = uses_detection_history(options)
+    haar_detectors = []
+    face_detectors = []
+    thread_state = threading.local()
+
+    def get_haar_detector():
+        if detection_options["fallback"] != "haar":
+            return None
+        detector = getattr(thread_state, "haar_detector", None)
+        if detector is None:
+            detector = create_haar_detector(
+                scale_factor=detection_options["haar_scale"],
+                min_neighbors=detection_options["haar_neighbors"],
+                min_size=detection_options["min_size"],
+            )
+            thread_state.haar_detector = detector
+            haar_detectors.append(detector)
+        return detector
+
+    def get_face_detector():
+        detector = getattr(thread_state, "face_detector", None)
+        if detector is None:
+            detector = create_face_detector(**detection_options)
+            thread_state.face_detector = detector
+            face_detectors.append(detector)
+        return detector
+
+    def detect(context):
+        frame_for_detection = get_resized(context)
+        if roi_state is not None:
+            return detect_faces_roi(
+                frame_for_detection,
+                roi_state,
+                haar_detector=get_haar_detector(),
+                face_detector=get_face_detector(),
+                context=context,
+                **detection_options,
+            )
+        return detect_faces(
+            frame_for_detection,
+            haar_detector=get_haar_detector(),
+            face_detector=get_face_detector(),
+            context=context,
+            **detection_options,
+        )
+
+    def process(item):
+        context = item["context"]
+        tracks = None
+        emotion_needed = None
+        if tracking_state is None:
+            face_boxes = detect(context)
+        else:
+            tracks = track_faces(
+                tracking_state, get_gray(context), lambda: detect(context)
+            )
+            face_boxes = [track["box"] for track in tracks]
+            emotion_needed = select_emotion_refresh(tracking_state, tracks)
+            if item["warmup"]:
+                reset_emotion_refresh(tracks)
+        scale_x, scale_y = get_scale(context)
+        if scale_x != 1.0 or scale_y != 1.0:
+            face_boxes = scale_boxes(face_boxes, scale_x, scale_y)
+        item["boxes"] = face_boxes
+        item["tracks"] = tracks
+        item["track_ids"] = (
+            None if tracks is None else [track["id"] for track in tracks]
+        )
+        item["emotion_needed"] = emotion_needed
+
+    def close():
+        for detector in haar_detectors:
+            close_haar_detector(detector)
+        for detector in face_detectors:
+            close_face_detector(detector)
+
+    def save():
+        saved = {}
+        if tracking_state is not None:
+            saved["tracking"] = dict(tracking_state)
+        if roi_state is not None:
+            saved["roi"] = {
+                key: roi_state[key]
+                for key in ("frames_since_full", "prev_boxes", "prev_gray")
+            }
+        return saved
+
+    def restore(saved):
+        if tracking_state is not None:
+            tracking_state.update(saved["tracking"])
+        if roi_state is not None:
+            roi_state.update(saved["roi"])
+
+    return create_stage(
+        "faces",
+        inputs=("context",),
+        outputs=("boxes", "tracks", "track_ids", "emotion_needed"),
+        process=process,
+        carry=carry_faces,
+        close=close,
+        parallel=not stateful,
+        warmup=stateful or feeds_anomaly_signals(options, ("faces", "emotions")),
+        save=save if stateful else None,
+        restore=restore if stateful else None,
+        cache_params=None if stateful else DETECTION_CACHE_PARAMS,
+    )
+
+
+def carry_per_box(item, last, key):
+    previous = last[key] or []
+    tracks = item.get("tracks")
+    if tracks is not None and last.get("track_ids") is not None:
+        by_track = dict(zip(last["track_ids"], previous))
+        item[key] = [by_track.get(track["id"], "unknown") for track in tracks]
+        return
+    count = len(item.get("boxes") or [])
+    item[key] = (list(previous) + ["unknown"] * count)[:count]
+
+
+def carry_emotions(stage, item, last):
+    carry_per_box(item, last, "emotions")
+
+
+def carry_identities(stage, item, last):
+    carry_per_box(item, last, "identities")
+
+
+def create_identity_stage(options):
+    gallery = create_empty_gallery()
+    if options["gallery"]:
+        gallery = load_gallery(options["gallery"], options["gallery_cache"])
+    clusters = None
+    if options["cluster_unknown"]:
+        clusters = create_unknown_clusters(
+            tolerance=options["cluster_tolerance"],
+            start_id=options.get("track_id_offset", 0) + 1,
+        )
+    track_identities = {}
+
+    def process(item):
+        face_boxes = item["boxes"]
+        track_ids = item["track_ids"] if item.get("tracks") is not None else None
+        identities = [None] * len(face_boxes)
+        if track_ids is not None:
+            for index, track_id in enumerate(track_ids):
+                identities[index] = track_identities.get(track_id)
+        pending = [index for index, identity in enumerate(identities) if identity is None]
+        encodings = compute_face_encodings(
+            item["frame"], [face_boxes[index] for index in pending]
+        )
+        labels = match_encodings(gallery, encodings, options["identity_tolerance"])
+        for index, encoding, label in zip(pending, encodings, labels):
+            if label is None and clusters is not None:
+                label = assign_unknown(clusters, encoding)
+            if label is not None and track_ids is not None:
+                track_identities[track_ids[index]] = label
+            identities[index] = label or "unknown"
+        item["identities"] = identities
+
+    def save():
+        return {
+            "clusters": save_unknown_clusters(clusters) if clusters else None,
+            "track_identities": dict(track_identities),
+        }
+
+    def restore(saved):
+        if clusters is not None and saved["clusters"] is not None:
+            restore_unknown_clusters(clusters, saved["clusters"])
+        track_identities.clear()
+        track_identities.update(saved["track_identities"])
+
+    return create_stage(
+        "identities",
+        inputs=("frame", "boxes"),
+        outputs=("identities",),
+        process=process,
+        carry=carry_identities,
+        carry_keys=("track_ids",),
+        parallel=clusters is None and not uses_detection_history(options),
+        save=save,
+        restore=restore,
+    )
+
+
+def create_emotion_stage(options):
+    emotion_engine = create_emotion_engine(
+        batch_size=options["emotion_batch_size"],
+        face_padding=options["face_padding"],
+    )
+    batch_limit = max(1, options["emotion_batch_size"] or 1)
+    frame_limit = 1 if options["live"] else batch_limit
+
+    def should_flush(pending):
+        analyzed = [item for item in pending if item["analyzed"]]
+        if len(analyzed) >= frame_limit:
+            return True
+        pending_faces = sum(len(item.get("boxes") or []) for item in analyzed)
+        return pending_faces >= batch_limit
+
+    def process_batch(items):
+        requests = []
+        for item in items:
+            face_boxes = item["boxes"]
+            if item.get("tracks") is not None:
+                face_boxes = [
+                    box
+                    for box, needed in zip(face_boxes, item["emotion_needed"])
+                    if needed
+                ]
+            requests.append((item["frame"], face_boxes))
+        emotions_per_frame = analyze_emotions_batch(emotion_engine, requests)
+        for item, emotions in zip(items, emotions_per_frame):
+            if item.get("tracks") is not None:
+                emotions = resolve_track_emotions(
+                    item["tracks"], item["emotion_needed"], emotions
+                )
+            item["emotions"] = emotions
+
+    return create_stage(
+        "emotions",
+        inputs=("frame", "boxes"),
+        outputs=("emotions",),
+        process_batch=process_batch,
+        should_flush=should_flush,
+        warmup=feeds_anomaly_signals(options, ("emotions",)),
+        carry=carry_emotions,
+        carry_keys=("track_ids",),
+        cache_params=None if uses_detection_history(options) else EMOTION_CACHE_PARAMS,
+    )
+
+
+def create_activity_stage(options):
+    activity_state = create_activity_state(
+        window=options["activity_window"],
+        lite_pose=bool(options["live"]),
+        min_visibility=options["pose_min_visibility"],
+    )
+
+    def process(item):
+        context = item["context"]
+        activity, motion_score = detect_activity(
+            get_resized(context),
+            activity_state,
+            context=context,
+            frame_gap=item["frame_gap"],
+            lite="pose" in item.get("shed", ()),
+        )
+        item["activity"] = activity
+        item["motion_score"] = motion_score
+
+    return create_stage(
+        "activity",
+        inputs=("context", "frame_gap"),
+        outputs=("activity", "motion_score"),
+        process=process,
+        close=lambda: release_activity_state(activity_state),
+        warmup=True,
+        save=lambda: save_activity_state(activity_state),
+        restore=lambda saved: restore_activity_state(activity_state, saved),
+    )
+
+
+ANOMALY_SIGNAL_INPUTS = {
+    "motion": "motion_score",
+    "faces": "boxes",
+    "emotions": "emotions",
+}
+
+
+def create_anomaly_stage(options):
+    signals = tuple(options["anomaly_signals"])
+    unknown = [name for name in signals if name not in ANOMALY_SIGNAL_INPUTS]
+    if unknown:
+        raise ValueError(f"Unknown anomaly signal(s): {', '.join(unknown)}")
+    detector = create_anomaly_detector(
+        signals=signals,
+        method=options["anomaly_method"],
+        window=options["anomaly_window"],
+        threshold=options["anomaly_threshold"],
+        estimator=options["anomaly_estimator"],
+        min_values={"motion": options["anomaly_min_motion"]},
+    )
+    signal_keys = ()
+    if len(signals) > 1:
+        signal_keys = tuple(f"anomaly_{name}" for name in signals)
+
+    def process(item):
+        boxes = item.get("boxes")
+        triggered = detect_anomalies(
+            detector,
+            motion_score=item.get("motion_score"),
+            face_count=len(boxes) if boxes is not None else None,
+            emotions=item.get("emotions"),
+        )
+        item["is_anomaly"] = bool(triggered)
+        for name, key in zip(signals, signal_keys):
+            item[key] = name in triggered
+
+    return create_stage(
+        "anomaly",
+        inputs=tuple(ANOMALY_SIGNAL_INPUTS[name] for name in signals),
+        outputs=("is_anomaly",) + signal_keys,
+        process=process,
+        warmup=True,
+        save=lambda: save_anomaly_detector(detector),
+        restore=lambda saved: restore_anomaly_detector(detector, saved),
+    )
+
+
+def interpolate_skipped(items):
+    end = items[-1]
+    if not end["analyzed"] or end.get("boxes") is None:
+        return
+    for item in items[:-1]:
+        start_index = item.get("carried_from")
+        if start_index is None or item.get("boxes") is None:
+            continue
+        ratio = (item["frame_index"] - start_index) / float(
+            end["frame_index"] - start_index
+        )
+        item["boxes"] = interpolate_boxes(
+            item["boxes"],
+            end["boxes"],
+            ratio,
+            start_ids=item.get("track_ids"),
+            end_ids=end.get("track_ids"),
+        )
+
+
+def create_annotation_stage(options):
+    def process_batch(items):
+        interpolate_skipped(items)
+        for item in items:
+            process(item)
+
+    def process(item):
+        annotated_frame = item["frame"]
+        face_boxes = item.get("boxes")
+        if face_boxes is not None:
+            annotated_frame = draw_face_boxes(annotated_frame, face_boxes)
+            if item.get("emotions") is not None:
+                annotated_frame = draw_emotions(
+                    annotated_frame, face_boxes, item["emotions"]
+                )
+            if item.get("identities") is not None:
+                annotated_frame = draw_identities(
+                    annotated_frame, face_boxes, item["identities"]
+                )
+        if item.get("activity") is not None:
+            annotated_frame = draw_activity(annotated_frame, item["activity"])
+        item["annotated"] = annotated_frame
+
+    return create_stage(
+        "annotate",
+        inputs=("frame",),
+        outputs=("annotated",),
+        process=None if options["interpolate_boxes"] else process,
+        process_batch=process_batch if options["interpolate_boxes"] else None,
+        should_flush=lambda pending: pending[-1]["analyzed"],
+        on_skipped=True,
+    )
+
+
+STAGE_FACTORIES = {
+    "faces": create_face_stage,
+    "identities": create_identity_stage,
+    "emotions": create_emotion_stage,
+    "activity": create_activity_stage,
+    "anomaly": create_anomaly_stage,
+    "annotate": create_annotation_stage,
+}
+
+
+def warm_up_faces(options):
+    warm_up_face_detector(**build_detection_options(options))
+
+
+def warm_up_emotions(options):
+    if options["emotion_batch_size"] and options["emotion_batch_size"] > 1:
+        try:
+            load_emotion_model()
+            return
+        except Exception:
+            pass
+    load_deepface()
+
+
+def warm_up_activity(options):
+    release_pose(acquire_pose())
+
+
+def warm_up_identities(options):
+    load_face_recognition()
+    if options["gallery"]:
+        load_gallery(options["gallery"], options["gallery_cache"])
+
+
+MODEL_WARMUPS = {
+    "faces": warm_up_faces,
+    "identities": warm_up_identities,
+    "emotions": warm_up_emotions,
+    "activity": warm_up_activity,
+}
+
+
+def resolve_stage_names(options):
+    skip = tuple(options["skip_stages"] or ())
+    if options["no_video"] and "annotate" in options["stages"]:
+        skip += ("annotate",)
+    identify = options["gallery"] or options["cluster_unknown"]
+    if not identify and "identities" in options["stages"]:
+        skip += ("identities",)
+    return select_stage_names(options["stages"], skip=skip, order=options["stage_order"])
+
+
+def warm_up_models(options):
+    names = resolve_stage_names(options)
+    load_seconds = {}
+    for name in names:
+        if name not in MODEL_WARMUPS:
+            continue
+        started_at = time.perf_counter()
+        MODEL_WARMUPS[name](options)
+        load_seconds[name] = time.perf_counter() - started_at
+    return load_seconds
+
+
+def save_stage_outputs(stage, item):
+    return {key: item[key] for key in stage["outputs"]}
+
+
+def load_stage_outputs(item, value):
+    item.update(value)
+
+
+def wrap_cached_stage(stage, cache, stage_key):
+    save = partial(save_stage_outputs, stage)
+    process = stage["process"]
+    process_batch = stage["process_batch"]
+
+    def cached_process(item):
+        value = cache_get(cache, stage_key, item["frame_index"])
+        if value is not None:
+            load_stage_outputs(item, value)
+            return
+        process(item)
+        cache_put(cache, stage_key, item["frame_index"], save(item))
+
+    def cached_process_batch(items):
+        misses = []
+        for item in items:
+            value = cache_get(cache, stage_key, item["frame_index"])
+            if value is None:
+                misses.append(item)
+            else:
+                load_stage_outputs(item, value)
+        if misses:
+            process_batch(misses)
+            for item in misses:
+                cache_put(cache, stage_key, item["frame_index"], save(item))
+
+    if process is not None:
+        stage["process"] = cached_process
+    if process_batch is not None:
+        stage["process_batch"] = cached_process_batch
+
+
+def open_stage_cache(options):
+    if not options["cache"]:
+        return None
+    return create_result_cache(options["cache_dir"], options["video_hash"])
+
+
+def upstream_stage_names(stage, stages):
+    needed = set(stage["inputs"])
+    names = []
+    for other in reversed(stages[: stages.index(stage)]):
+        if needed & set(other["outputs"]):
+            names.append(other["name"])
+            needed |= set(other["inputs"])
+    return names
+
+
+def build_cache_params(stage, stages, options):
+    params = {name: options[name] for name in stage["cache_params"]}
+    names = [stage["name"]] + upstream_stage_names(stage, stages)
+    params["every"] = {
+        other["name"]: other["every"] for other in stages if other["name"] in names
+    }
+    return params
+
+
+def build_stages(options, cache=None):
+    names = resolve_stage_names(options)
+    stage_every = options["stage_every"] or {}
+    unknown = [name for name in stage_every if name not in names]
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(unknown)}")
+    stages = [STAGE_FACTORIES[name](options) for name in names]
+    for stage in stages:
+        stage["every"] = max(1, stage_every.get(stage["name"], 1))
+    for stage in stages:
+        if cache is not None and stage["cache_params"] is not None:
+            stage_key = build_params_key(
+                stage["name"], build_cache_params(stage, stages, options)
+            )
+            wrap_cached_stage(stage, cache, stage_key)
+    try:
+        validate_stages(stages)
+    except ValueError:
+        close_stages(stages)
+        raise
+    return stages
+
+
+def analyze_video(
+    capture,
+    fps,
+    write,
+    options,
+    start_frame=0,
+    end_frame=None,
+    emit_from=0,
+    checkpoint_state=False,
+    resume_state=None,
+    frames=None,
+):
+    cache = open_stage_cache(options)
+    stages = build_stages(options, cache=cache)
+    max_frames = options["max_frames"]
+    if resume_state is not None:
+        start_frame = resume_state["frame_index"]
+        if max_frames:
+            max_frames = max_frames - resume_state["analyzed"]
+            if max_frames <= 0:
+                end_frame = start_frame
+    sampler = None
+    if frames is None:
+        if options["sampling"] == "adaptive":
+            sampler = create_adaptive_sampler(
+                fps,
+                min_step=options["sample_min_step"],
+                max_step=options["sample_max_step"],
+                target_fps=options["target_fps"],
+                motion_low=options["motion_low"],
+                motion_high=options["motion_high"],
+            )
+        frames = read_frames(
+            capture,
+            frame_step=options["frame_step"],
+            max_frames=max_frames,
+            start_frame=start_frame,
+            end_frame=end_frame,
+            emit_from=emit_from,
+            profile=options["profile"],
+            sampler=sampler,
+            skip_decode=options["no_video"],
+            decode_strategy=options["decode_strategy"],
+            keyframe_interval=options["keyframe_interval"],
+        )
+    try:
+        summary_state = run_engine(
+            frames,
+            stages,
+            write,
+            fps,
+            summary_only=options["summary_only"],
+            resize_width=options["resize_width"],
+            pipeline_mode=options["pipeline_mode"],
+            analysis_workers=options["analysis_workers"],
+            decode_queue_size=options["decode_queue_size"],
+            analysis_queue_size=options["analysis_queue_size"],
+            encode_queue_size=options["encode_queue_size"],
+            profile=options["profile"],
+            profile_frames=options["profile_frames"],
+            checkpoint_interval=options["checkpoint_interval"],
+            checkpoint_state=checkpoint_state,
+            resume_state=resume_state,
+            carry_forward=options["carry_annotations"] or options["interpolate_boxes"],
+        )
+    finally:
+        cache_stats = close_result_cache(cache) if cache is not None else {}
+    summary_state["cache"] = cache_stats
+    if sampler is not None:
+        summary_state["sampling"] = summarize_sampler(sampler)
+    return summary_state
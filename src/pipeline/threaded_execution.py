@@ -0,0 +1,154 @@
+import queue
+import threading
+
+STOP = None
+POLL_SECONDS = 0.1
+
+
+def put_until_stopped(target_queue, value, stop_event):
+    while not stop_event.is_set():
+        try:
+            target_queue.put(value, timeout=POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def get_until_stopped(source_queue, stop_event):
+    while not stop_event.is_set():
+        try:
+            return source_queue.get(timeout=POLL_SECONDS)
+        except queue.Empty:
+            continue
+    return STOP
+
+
+def acquire_until_stopped(slots, stop_event):
+    while not stop_event.is_set():
+        if slots.acquire(timeout=POLL_SECONDS):
+            return True
+    return False
+
+
+def start_thread(target, errors, stop_event, *args):
+    def runner():
+        try:
+            target(*args)
+        except BaseException as error:
+            errors.append(error)
+            stop_event.set()
+
+    thread = threading.Thread(target=runner, daemon=True)
+    thread.start()
+    return thread
+
+
+def decode_frames(frames, decode_queue, slots, stop_event, worker_count):
+    for sequence, item in enumerate(frames):
+        if not acquire_until_stopped(slots, stop_event):
+            return
+        item["sequence"] = sequence
+        if not put_until_stopped(decode_queue, item, stop_event):
+            return
+    for _ in range(worker_count):
+        put_until_stopped(decode_queue, STOP, stop_event)
+
+
+def analyze_frames(prepare, decode_queue, analysis_queue, stop_event):
+    while True:
+        item = get_until_stopped(decode_queue, stop_event)
+        if item is STOP:
+            put_until_stopped(analysis_queue, STOP, stop_event)
+            return
+        if item["analyzed"]:
+            prepare(item)
+        if not put_until_stopped(analysis_queue, item, stop_event):
+            return
+
+
+def encode_frames(write, encode_queue, stop_event):
+    while True:
+        value = get_until_stopped(encode_queue, stop_event)
+        if value is STOP:
+            return
+        write(*value)
+
+
+def run_serial(frames, prepare, consume, finish, write):
+    for item in frames:
+        if item["analyzed"]:
+            prepare(item)
+        consume(item, write)
+    finish(write)
+
+
+def run_threaded(
+    frames,
+    prepare,
+    consume,
+    finish,
+    write,
+    worker_count=2,
+    decode_queue_size=16,
+    analysis_queue_size=16,
+    encode_queue_size=32,
+):
+    worker_count = max(1, worker_count)
+    stop_event = threading.Event()
+    encoder_stop = threading.Event()
+    errors = []
+    decode_queue = queue.Queue(maxsize=max(1, decode_queue_size))
+    analysis_queue = queue.Queue(maxsize=max(1, analysis_queue_size))
+    encode_queue = queue.Queue(maxsize=max(1, encode_queue_size))
+    slots = threading.Semaphore(
+        max(1, decode_queue_size) + max(1, analysis_queue_size) + worker_count
+    )
+
+    def emit(frame, record):
+        if not put_until_stopped(encode_queue, (frame, record), encoder_stop):
+            raise RuntimeError("Encoder stage stopped unexpectedly")
+
+    encoder = start_thread(encode_frames, errors, encoder_stop, write, encode_queue, encoder_stop)
+    threads = [
+        start_thread(
+            decode_frames, errors, stop_event, frames, decode_queue, slots, stop_event, worker_count
+        )
+    ]
+    for _ in range(worker_count):
+        threads.append(
+            start_thread(
+                analyze_frames, errors, stop_event, prepare, decode_queue, analysis_queue, stop_event
+            )
+        )
+
+    reorder = {}
+    next_sequence = 0
+    finished_workers = 0
+    try:
+        while finished_workers < worker_count and not stop_event.is_set():
+            item = get_until_stopped(analysis_queue, stop_event)
+            if item is STOP:
+                finished_workers += 1
+                continue
+            reorder[item["sequence"]] = item
+            while next_sequence in reorder:
+                consume(reorder.pop(next_sequence), emit)
+                slots.release()
+                next_sequence += 1
+        if not errors:
+            finish(emit)
+            put_until_stopped(encode_queue, STOP, encoder_stop)
+            encoder.join()
+    except BaseException:
+        if errors:
+            raise errors[0]
+        raise
+    finally:
+        stop_event.set()
+        encoder_stop.set()
+        for thread in threads:
+            thread.join()
+        encoder.join()
+    if errors:
+        raise errors[0]
@@ -0,0 +1,117 @@
+import argparse
+import json
+import os
+
+from config.settings import (
+    DEFAULT_ANALYSIS_METADATA_FILE,
+    DEFAULT_ANALYSIS_OUTPUT_DIR,
+    DEFAULT_INDEX_BLOCK_SIZE,
+)
+from pipeline.metadata_query import (
+    aggregate_window,
+    build_timeline,
+    list_anomalies,
+    load_index,
+    top_labels,
+)
+
+QUERIES = ("summary", "timeline", "top", "anomalies", "index")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("query", choices=QUERIES)
+    parser.add_argument(
+        "--metadata",
+        default=os.path.join(
+            DEFAULT_ANALYSIS_OUTPUT_DIR, DEFAULT_ANALYSIS_METADATA_FILE
+        ),
+    )
+    parser.add_argument("--index", default=None)
+    parser.add_argument("--rebuild-index", action="store_true")
+    parser.add_argument("--block-size", type=int, default=DEFAULT_INDEX_BLOCK_SIZE)
+    parser.add_argument("--start", type=float, default=None)
+    parser.add_argument("--end", type=float, default=None)
+    parser.add_argument("--start-frame", type=int, default=None)
+    parser.add_argument("--end-frame", type=int, default=None)
+    parser.add_argument("--bucket", type=float, default=60.0)
+    parser.add_argument(
+        "--field",
+        choices=["emotions", "activities", "identities"],
+        default="emotions",
+    )
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--identity", default=None)
+    parser.add_argument("--limit", type=int, default=None)
+    return parser
+
+
+def resolve_window(args, parser):
+    by_time = args.start is not None or args.end is not None
+    by_frame = args.start_frame is not None or args.end_frame is not None
+    if by_time and by_frame:
+        parser.error("use either --start/--end or --start-frame/--end-frame")
+    if by_frame:
+        return "frame_index", args.start_frame, args.end_frame
+    return "timestamp", args.start, args.end
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    if not args.metadata.endswith(".jsonl"):
+        parser.error("--metadata must be a per-frame .jsonl file")
+    key, start, end = resolve_window(args, parser)
+    index = load_index(
+        args.metadata,
+        index_path=args.index,
+        block_size=max(1, args.block_size),
+        rebuild=args.rebuild_index,
+    )
+    if not index["blocks"] and args.query != "index":
+        parser.error(
+            f"{args.metadata} has no per-frame records; run with --full-metadata"
+        )
+    window = {"key": key, "start": start, "end": end}
+    if args.query == "index":
+        blocks = index["blocks"]
+        print(
+            json.dumps(
+                {
+                    "status": index["status"],
+                    "blocks": len(blocks),
+                    "frames": sum(
+                        block["summary"]["frames_processed"] for block in blocks
+                    ),
+                    "first_frame": blocks[0]["first_frame"] if blocks else None,
+                    "last_frame": blocks[-1]["last_frame"] if blocks else None,
+                    "duration_seconds": blocks[-1]["last_time"] if blocks else 0.0,
+                }
+            )
+        )
+    elif args.query == "summary":
+        summary = aggregate_window(args.metadata, index, top_k=args.top, **window)
+        print(json.dumps(dict(summary, window=window)))
+    elif args.query == "timeline":
+        if key == "frame_index":
+            bucket = max(1, int(args.bucket))
+        else:
+            bucket = args.bucket
+        for entry in build_timeline(
+            args.metadata, index, bucket, top_k=args.top, **window
+        ):
+            print(json.dumps(entry))
+    elif args.query == "top":
+        labels = top_labels(
+            args.metadata, index, args.field, top_k=args.top, **window
+        )
+        print(json.dumps({"field": args.field, "top": labels, "window": window}))
+    else:
+        for anomaly in list_anomalies(
+            args.metadata, index, identity=args.identity, limit=args.limit, **window
+        ):
+            print(json.dumps(anomaly))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+def create_buffer_pool():
+    return {"free": deque()}
+
+
+def acquire_frame_buffers(pool):
+    try:
+        return pool["free"].pop()
+    except IndexError:
+        return {}
+
+
+def release_frame_buffers(pool, buffers):
+    pool["free"].append(buffers)
+
+
+def create_frame_context(frame_bgr, buffers=None, resize_width=None):
+    return {
+        "bgr": frame_bgr,
+        "buffers": {} if buffers is None else buffers,
+        "resize_width": resize_width,
+        "views": {},
+    }
+
+
+def get_buffer(context, name, shape, dtype=np.uint8):
+    buffer = context["buffers"].get(name)
+    if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+        buffer = np.empty(shape, dtype=dtype)
+        context["buffers"][name] = buffer
+    return buffer
+
+
+def get_resized_size(context):
+    height, width = context["bgr"].shape[:2]
+    resize_width = context["resize_width"]
+    if not resize_width:
+        return width, height
+    return resize_width, int(height * (resize_width / float(width)))
+
+
+def get_scale(context):
+    height, width = context["bgr"].shape[:2]
+    resized_width, resized_height = get_resized_size(context)
+    return width / float(resized_width), height / float(resized_height)
+
+
+def get_resized(context):
+    views = context["views"]
+    if "resized" not in views:
+        frame = context["bgr"]
+        width, height = get_resized_size(context)
+        if (width, height) == (frame.shape[1], frame.shape[0]):
+            views["resized"] = frame
+        else:
+            buffer = get_buffer(context, "resized", (height, width, 3))
+            views["resized"] = cv2.resize(frame, (width, height), dst=buffer)
+    return views["resized"]
+
+
+def get_rgb(context):
+    views = context["views"]
+    if "rgb" not in views:
+        resized = get_resized(context)
+        buffer = get_buffer(context, "rgb", resized.shape)
+        views["rgb"] = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=buffer)
+    return views["rgb"]
+
+
+def get_gray(context):
+    views = context["views"]
+    if "gray" not in views:
+        resized = get_resized(context)
+        buffer = get_buffer(context, "gray", resized.shape[:2])
+        views["gray"] = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY, dst=buffer)
+    return views["gray"]
+
+
+def store_copy(target, source):
+    if target is None or target.shape != source.shape:
+        return source.copy()
+    np.copyto(target, source)
+    return target
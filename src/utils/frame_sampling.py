@@ -0,0 +1,98 @@
+import cv2
+
+
+def create_adaptive_sampler(
+    fps,
+    min_step=1,
+    max_step=10,
+    target_fps=None,
+    motion_low=0.003,
+    motion_high=0.03,
+    sample_width=64,
+    smoothing=0.3,
+):
+    min_step = max(1, min_step)
+    budget = target_fps / fps if target_fps and fps else None
+    return {
+        "min_step": min_step,
+        "max_step": max(min_step, max_step),
+        "motion_low": motion_low,
+        "motion_high": max(motion_high, motion_low + 1e-6),
+        "sample_width": sample_width,
+        "smoothing": smoothing,
+        "budget": budget,
+        "credit": 1.0,
+        "credit_limit": max(1.0, budget * fps) if budget else None,
+        "prev_small": None,
+        "motion_diff": None,
+        "motion": 0.0,
+        "gap": None,
+        "decoded": 0,
+        "analyzed": 0,
+    }
+
+
+def measure_motion(sampler, frame):
+    height, width = frame.shape[:2]
+    sample_width = min(width, sampler["sample_width"])
+    sample_height = max(1, height * sample_width // width)
+    small = cv2.resize(frame, (sample_width, sample_height), interpolation=cv2.INTER_AREA)
+    small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    previous = sampler["prev_small"]
+    sampler["prev_small"] = small
+    if previous is None:
+        return 0.0
+    diff = cv2.absdiff(previous, small, dst=sampler["motion_diff"])
+    sampler["motion_diff"] = diff
+    return diff.mean() / 255.0
+
+
+def select_step(sampler):
+    span = sampler["motion_high"] - sampler["motion_low"]
+    level = min(1.0, max(0.0, (sampler["motion"] - sampler["motion_low"]) / span))
+    return sampler["max_step"] - level * (sampler["max_step"] - sampler["min_step"])
+
+
+def sample_frame(sampler, frame):
+    motion = measure_motion(sampler, frame)
+    smoothing = sampler["smoothing"]
+    sampler["motion"] = smoothing * motion + (1.0 - smoothing) * sampler["motion"]
+    sampler["decoded"] += 1
+    if sampler["budget"] is not None:
+        sampler["credit"] = min(
+            sampler["credit_limit"], sampler["credit"] + sampler["budget"]
+        )
+
+    gap = sampler["gap"]
+    if gap is None:
+        analyzed = True
+        gap = 1
+    else:
+        gap += 1
+        if gap >= sampler["max_step"]:
+            analyzed = True
+        elif gap < sampler["min_step"]:
+            analyzed = False
+        else:
+            analyzed = gap >= select_step(sampler)
+            if analyzed and sampler["budget"] is not None:
+                analyzed = sampler["credit"] >= 1.0
+
+    if not analyzed:
+        sampler["gap"] = gap
+        return False, gap
+    sampler["gap"] = 0
+    sampler["analyzed"] += 1
+    if sampler["budget"] is not None:
+        sampler["credit"] -= 1.0
+    return True, gap
+
+
+def summarize_sampler(sampler):
+    decoded = sampler["decoded"]
+    analyzed = sampler["analyzed"]
+    return {
+        "decoded_frames": decoded,
+        "analyzed_frames": analyzed,
+        "mean_step": decoded / analyzed if analyzed else 0.0,
+    }
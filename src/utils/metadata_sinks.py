@@ -0,0 +1,220 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+METADATA_FORMATS = ("jsonl", "npz", "npy")
+BOX_KEYS = ("identities", "emotions", "track_ids")
+COLUMN_CHUNK_SIZE = 4096
+
+
+def resolve_metadata_path(metadata_path, metadata_format):
+    stem = os.path.splitext(metadata_path)[0]
+    if metadata_format == "npz":
+        return stem + ".npz"
+    if metadata_format == "npy":
+        return stem + "_columns"
+    return metadata_path
+
+
+def write_json_atomic(path, data):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as handle:
+        json.dump(data, handle)
+    os.replace(temp_path, path)
+
+
+def create_jsonl_sink(path, buffer_size=256):
+    handle = open(path, "w", encoding="utf-8")
+    lines = []
+
+    def flush():
+        if lines:
+            handle.write("".join(lines))
+            lines.clear()
+
+    def write(record):
+        lines.append(json.dumps(record) + "\n")
+        if len(lines) >= buffer_size:
+            flush()
+
+    def checkpoint(summary):
+        lines.append(json.dumps({"checkpoint": summary}) + "\n")
+        flush()
+        handle.flush()
+
+    def close(summary=None):
+        if summary is not None:
+            lines.append(json.dumps({"summary": summary}) + "\n")
+        flush()
+        handle.close()
+
+    return {"path": path, "write": write, "checkpoint": checkpoint, "close": close}
+
+
+def create_column_state():
+    return {
+        "frames": {},
+        "rows": 0,
+        "boxes": [],
+        "box_offsets": [0],
+        "box_fields": {},
+    }
+
+
+def append_record_columns(columns, record):
+    frames = columns["frames"]
+    rows = columns["rows"]
+    values = {}
+    for key, value in record.items():
+        if key == "boxes" or key in BOX_KEYS:
+            continue
+        if key == "timings_ms":
+            for name, milliseconds in value.items():
+                values[f"timing_{name}_ms"] = milliseconds
+            continue
+        values[key] = value
+    for key in values:
+        if key not in frames:
+            frames[key] = [None] * rows
+    for key, column in frames.items():
+        column.append(values.get(key))
+    columns["rows"] = rows + 1
+
+    boxes = record.get("boxes") or []
+    box_count = len(columns["boxes"])
+    columns["boxes"].extend(boxes)
+    columns["box_offsets"].append(columns["box_offsets"][-1] + len(boxes))
+    box_fields = columns["box_fields"]
+    for key in BOX_KEYS:
+        if key in record and key not in box_fields:
+            box_fields[key] = [None] * box_count
+    for key, column in box_fields.items():
+        column.extend(record.get(key) or [None] * len(boxes))
+
+
+def build_column(values):
+    present = [value for value in values if value is not None]
+    if len(present) == len(values):
+        return np.asarray(values)
+    if present and all(isinstance(value, str) for value in present):
+        return np.asarray(["" if value is None else value for value in values])
+    return np.asarray(
+        [np.nan if value is None else value for value in values], dtype=np.float64
+    )
+
+
+def build_column_arrays(columns):
+    arrays = {key: build_column(values) for key, values in columns["frames"].items()}
+    arrays["boxes"] = np.asarray(columns["boxes"], dtype=np.int32).reshape(-1, 4)
+    arrays["box_offsets"] = np.asarray(columns["box_offsets"], dtype=np.int64)
+    for key, values in columns["box_fields"].items():
+        arrays[key] = build_column(values)
+    return arrays
+
+
+def merge_column_parts(arrays, lengths):
+    pairs = [(array, length) for array, length in zip(arrays, lengths) if length]
+    if not pairs:
+        return np.asarray([])
+    if any(array is not None and array.dtype.kind == "U" for array, _ in pairs):
+        return np.concatenate(
+            [
+                array
+                if array is not None and array.dtype.kind == "U"
+                else np.full(length, "")
+                for array, length in pairs
+            ]
+        )
+    return np.concatenate(
+        [np.full(length, np.nan) if array is None else array for array, length in pairs]
+    )
+
+
+def merge_column_arrays(parts):
+    row_counts = [len(part["box_offsets"]) - 1 for part in parts]
+    box_counts = [len(part["boxes"]) for part in parts]
+    offsets = [np.zeros(1, dtype=np.int64)]
+    for part, start in zip(parts, np.cumsum([0] + box_counts[:-1])):
+        offsets.append(part["box_offsets"][1:] + start)
+    arrays = {
+        "boxes": np.concatenate([part["boxes"] for part in parts]),
+        "box_offsets": np.concatenate(offsets),
+    }
+    for part in parts:
+        for key in part:
+            if key in arrays:
+                continue
+            lengths = box_counts if key in BOX_KEYS else row_counts
+            arrays[key] = merge_column_parts(
+                [other.get(key) for other in parts], lengths
+            )
+    return arrays
+
+
+def create_columnar_sink(path, metadata_format="npz", chunk_size=COLUMN_CHUNK_SIZE):
+    columns = create_column_state()
+    checkpoint_path = path + ".checkpoint.json"
+    parts_dir = path + ".parts"
+    part_paths = []
+    written = {"rows": 0}
+
+    def flush():
+        if not columns["rows"]:
+            return
+        os.makedirs(parts_dir, exist_ok=True)
+        part_path = os.path.join(parts_dir, f"part_{len(part_paths):04d}.npz")
+        np.savez(part_path, **build_column_arrays(columns))
+        part_paths.append(part_path)
+        written["rows"] += columns["rows"]
+        columns.update(create_column_state())
+
+    def write(record):
+        append_record_columns(columns, record)
+        if columns["rows"] >= chunk_size:
+            flush()
+
+    def checkpoint(summary):
+        flush()
+        write_json_atomic(
+            checkpoint_path,
+            {"frames_written": written["rows"], "summary": summary},
+        )
+
+    def load_arrays():
+        if not part_paths:
+            return build_column_arrays(columns)
+        flush()
+        parts = []
+        for part_path in part_paths:
+            with np.load(part_path) as data:
+                parts.append({key: data[key] for key in data.files})
+        return merge_column_arrays(parts)
+
+    def close(summary=None):
+        arrays = load_arrays()
+        if metadata_format == "npz":
+            if summary is not None:
+                arrays["summary_json"] = np.asarray(json.dumps(summary))
+            np.savez(path, **arrays)
+        else:
+            os.makedirs(path, exist_ok=True)
+            for key, array in arrays.items():
+                np.save(os.path.join(path, key + ".npy"), array)
+            if summary is not None:
+                write_json_atomic(os.path.join(path, "summary.json"), summary)
+        shutil.rmtree(parts_dir, ignore_errors=True)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+    return {"path": path, "write": write, "checkpoint": checkpoint, "close": close}
+
+
+def create_metadata_sink(metadata_path, metadata_format="jsonl", buffer_size=256):
+    if metadata_format not in METADATA_FORMATS:
+        raise ValueError(f"Unknown metadata format: {metadata_format}")
+    path = resolve_metadata_path(metadata_path, metadata_format)
+    if metadata_format == "jsonl":
+        return create_jsonl_sink(path, buffer_size=max(1, buffer_size))
+    return create_columnar_sink(path, metadata_format=metadata_format)
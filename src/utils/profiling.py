@@ -0,0 +1,78 @@
+import json
+import time
+
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+
+
+def create_profile_state():
+    return {"stages": {}, "frame_latencies": []}
+
+
+def add_stage_sample(profile_state, name, seconds):
+    profile_state["stages"].setdefault(name, []).append(seconds)
+
+
+def add_frame_timings(profile_state, timings, latency):
+    for name, seconds in timings.items():
+        add_stage_sample(profile_state, name, seconds)
+    profile_state["frame_latencies"].append(latency)
+
+
+def merge_profile_states(profile_states):
+    merged = create_profile_state()
+    for profile_state in profile_states:
+        for name, samples in profile_state["stages"].items():
+            merged["stages"].setdefault(name, []).extend(samples)
+        merged["frame_latencies"].extend(profile_state["frame_latencies"])
+    return merged
+
+
+def timed(profile_state, name, function):
+    def call(*args):
+        started_at = time.perf_counter()
+        result = function(*args)
+        add_stage_sample(profile_state, name, time.perf_counter() - started_at)
+        return result
+
+    return call
+
+
+def summarize_samples(samples):
+    if not samples:
+        return {"count": 0, "total_seconds": 0.0}
+    values = np.asarray(samples, dtype=np.float64)
+    milliseconds = np.percentile(values, PERCENTILES) * 1000.0
+    summary = {
+        "count": int(values.size),
+        "total_seconds": float(values.sum()),
+        "mean_ms": float(values.mean() * 1000.0),
+    }
+    for percentile, value in zip(PERCENTILES, milliseconds):
+        summary[f"p{percentile}_ms"] = float(value)
+    return summary
+
+
+def build_profile_report(profile_state, processed_frames, elapsed):
+    stages = {
+        name: summarize_samples(samples)
+        for name, samples in profile_state["stages"].items()
+    }
+    stage_total = sum(stage["total_seconds"] for stage in stages.values())
+    for stage in stages.values():
+        stage["share"] = stage["total_seconds"] / stage_total if stage_total else 0.0
+    return {
+        "frames_processed": processed_frames,
+        "elapsed_seconds": elapsed,
+        "fps": processed_frames / elapsed if elapsed else 0.0,
+        "frame_latency": summarize_samples(profile_state["frame_latencies"]),
+        "stages": stages,
+    }
+
+
+def write_profile_report(profile_path, profile_state, processed_frames, elapsed):
+    report = build_profile_report(profile_state, processed_frames, elapsed)
+    with open(profile_path, "w", encoding="utf-8") as profile_handle:
+        json.dump(report, profile_handle, indent=2)
+    return report
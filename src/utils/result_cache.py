@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+
+from config.settings import DEFAULT_CACHE_BLOCK_SIZE
+
+HASH_INDEX_FILE = "input_hashes.json"
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_input(input_path, cache_dir):
+    os.makedirs(cache_dir, exist_ok=True)
+    index_path = os.path.join(cache_dir, HASH_INDEX_FILE)
+    stat = os.stat(input_path)
+    entry_key = f"{os.path.abspath(input_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    index = {}
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, "r", encoding="utf-8") as index_handle:
+                index = json.load(index_handle)
+        except ValueError:
+            index = {}
+    if entry_key not in index:
+        index[entry_key] = hash_file(input_path)
+        temp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as index_handle:
+            json.dump(index, index_handle)
+        os.replace(temp_path, index_path)
+    return index[entry_key]
+
+
+def build_params_key(stage_name, params):
+    values = json.dumps(params, sort_keys=True)
+    digest = hashlib.sha256(values.encode("utf-8")).hexdigest()[:16]
+    return f"{stage_name}-{digest}"
+
+
+def create_result_cache(cache_dir, video_hash, block_size=DEFAULT_CACHE_BLOCK_SIZE):
+    return {
+        "dir": os.path.join(cache_dir, video_hash[:2], video_hash),
+        "block_size": block_size,
+        "blocks": {},
+        "dirty": set(),
+        "lock": threading.Lock(),
+        "hits": 0,
+        "misses": 0,
+    }
+
+
+def block_path(cache, stage_key, block_index):
+    return os.path.join(cache["dir"], stage_key, f"{block_index:08d}.pkl")
+
+
+def write_block(cache, block_key):
+    path = block_path(cache, *block_key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as block_handle:
+        pickle.dump(cache["blocks"][block_key], block_handle)
+    os.replace(temp_path, path)
+    cache["dirty"].discard(block_key)
+
+
+def read_block(path):
+    try:
+        with open(path, "rb") as block_handle:
+            block = pickle.load(block_handle)
+        os.utime(path)
+        return block
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return {}
+
+
+def release_old_blocks(cache, stage_key, block_index):
+    for block_key in list(cache["blocks"]):
+        if block_key[0] == stage_key and block_key[1] < block_index - 2:
+            if block_key in cache["dirty"]:
+                write_block(cache, block_key)
+            del cache["blocks"][block_key]
+
+
+def load_block(cache, stage_key, frame_index):
+    block_index = frame_index // cache["block_size"]
+    block_key = (stage_key, block_index)
+    block = cache["blocks"].get(block_key)
+    if block is None:
+        release_old_blocks(cache, stage_key, block_index)
+        block = read_block(block_path(cache, stage_key, block_index))
+        cache["blocks"][block_key] = block
+    return block_key, block
+
+
+def cache_get(cache, stage_key, frame_index):
+    with cache["lock"]:
+        _, block = load_block(cache, stage_key, frame_index)
+        value = block.get(frame_index)
+        if value is None:
+            cache["misses"] += 1
+        else:
+            cache["hits"] += 1
+        return value
+
+
+def cache_put(cache, stage_key, frame_index, value):
+    with cache["lock"]:
+        block_key, block = load_block(cache, stage_key, frame_index)
+        block[frame_index] = value
+        cache["dirty"].add(block_key)
+
+
+def evict_cache(cache_root, max_bytes):
+    entries = []
+    for directory, _, names in os.walk(cache_root):
+        for name in names:
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+    return total
+
+
+def close_result_cache(cache):
+    with cache["lock"]:
+        for block_key in list(cache["dirty"]):
+            write_block(cache, block_key)
+        cache["blocks"].clear()
+    return {"hits": cache["hits"], "misses": cache["misses"]}
@@ -0,0 +1,166 @@
+import os
+import queue
+import shutil
+import subprocess
+import threading
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+CAPTURE_BACKENDS = {
+    "auto": cv2.CAP_ANY,
+    "ffmpeg": cv2.CAP_FFMPEG,
+    "gstreamer": cv2.CAP_GSTREAMER,
+}
+DEFAULT_CODECS = {"opencv": "mp4v", "ffmpeg": "libx264"}
+
+
+def build_output_paths(output_dir, output_video, metadata_file):
+    os.makedirs(output_dir, exist_ok=True)
+    video_path = os.path.join(output_dir, output_video)
+    metadata_path = os.path.join(output_dir, metadata_file)
+    return video_path, metadata_path
+
+
+def open_capture(input_path, backend="auto", hw_decode=False):
+    params = []
+    if hw_decode and hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):
+        params = [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+    if params:
+        return cv2.VideoCapture(input_path, CAPTURE_BACKENDS[backend], params)
+    return cv2.VideoCapture(input_path, CAPTURE_BACKENDS[backend])
+
+
+def skip_frames(
+    capture, frame_index, target_index, strategy="grab", keyframe_interval=250
+):
+    if strategy == "seek" and target_index - frame_index >= keyframe_interval:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, target_index)
+        return target_index
+    while frame_index < target_index:
+        if strategy == "read":
+            success, _ = capture.read()
+        else:
+            success = capture.grab()
+        if not success:
+            return None
+        frame_index += 1
+    return frame_index
+
+
+def build_writer_options(options):
+    return {
+        "backend": options["video_backend"],
+        "codec": options["video_codec"],
+        "preset": options["encode_preset"],
+        "crf": options["encode_crf"],
+        "queue_size": options["encode_queue_size"],
+    }
+
+
+def create_null_writer():
+    return SimpleNamespace(write=lambda frame: None, release=lambda: None)
+
+
+def create_ffmpeg_writer(
+    output_path, fps, size, codec="libx264", preset="veryfast", crf=23, queue_size=32
+):
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg not found in PATH; use --video-backend opencv")
+    width, height = size
+    command = [
+        ffmpeg,
+        "-y",
+        "-loglevel",
+        "error",
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "bgr24",
+        "-s",
+        f"{width}x{height}",
+        "-r",
+        str(fps or 30.0),
+        "-i",
+        "-",
+        "-c:v",
+        codec,
+        "-pix_fmt",
+        "yuv420p",
+    ]
+    if codec in ("libx264", "libx265"):
+        command += ["-preset", preset, "-crf", str(crf)]
+    command.append(output_path)
+    process = subprocess.Popen(command, stdin=subprocess.PIPE)
+    frames = queue.Queue(maxsize=max(1, queue_size))
+    errors = []
+
+    def pump():
+        while True:
+            frame = frames.get()
+            if frame is None:
+                return
+            if errors:
+                continue
+            try:
+                process.stdin.write(np.ascontiguousarray(frame).data)
+            except OSError as error:
+                errors.append(error)
+
+    thread = threading.Thread(target=pump, name="ffmpeg-writer", daemon=True)
+    thread.start()
+
+    def write(frame):
+        if errors:
+            raise RuntimeError(f"ffmpeg stopped accepting frames for {output_path}")
+        frames.put(frame)
+
+    def release():
+        frames.put(None)
+        thread.join()
+        try:
+            process.stdin.close()
+        except OSError as error:
+            errors.append(error)
+        returncode = process.wait()
+        if returncode or errors:
+            raise RuntimeError(
+                f"ffmpeg exited with code {returncode} while writing {output_path}"
+            )
+
+    return SimpleNamespace(write=write, release=release)
+
+
+def create_writer(
+    capture,
+    output_path,
+    backend="opencv",
+    codec=None,
+    preset="veryfast",
+    crf=23,
+    queue_size=32,
+):
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if output_path is None:
+        return create_null_writer(), fps
+    codec = codec or DEFAULT_CODECS[backend]
+    if backend == "ffmpeg":
+        writer = create_ffmpeg_writer(
+            output_path,
+            fps,
+            (width, height),
+            codec=codec,
+            preset=preset,
+            crf=crf,
+            queue_size=queue_size,
+        )
+        return writer, fps
+    fourcc = cv2.VideoWriter_fourcc(*codec)
+    writer = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Failed to open video writer ({codec}): {output_path}")
+    return writer, fps
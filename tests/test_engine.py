@@ -0,0 +1,176 @@
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+import pipeline.stages as stages
+from pipeline.run_face_recognition import run_face_recognition
+from pipeline.runner import resolve_options
+from pipeline.stages import analyze_video
+
+FRAME_COUNT = 48
+BOX_COLOR = (0, 255, 0)
+
+
+def draw_ellipse(frame, center, axes, color):
+    cv2.ellipse(frame, center, axes, 0, 0, 360, color, -1)
+
+
+def draw_face(frame, center_x, center_y, size):
+    draw_ellipse(
+        frame, (center_x, center_y), (int(size * 0.8), size), (190, 200, 225)
+    )
+    eye_y = int(center_y - 0.25 * size)
+    brow_y = int(center_y - 0.45 * size)
+    for offset in (-0.35, 0.35):
+        eye_x = int(center_x + offset * size)
+        draw_ellipse(
+            frame, (eye_x, eye_y), (int(size * 0.18), int(size * 0.08)), (40, 40, 40)
+        )
+        cv2.line(
+            frame,
+            (int(eye_x - 0.2 * size), brow_y),
+            (int(eye_x + 0.2 * size), brow_y),
+            (60, 60, 60),
+            size // 12,
+        )
+    cv2.line(
+        frame,
+        (center_x, int(center_y - 0.1 * size)),
+        (center_x, int(center_y + 0.25 * size)),
+        (140, 150, 170),
+        size // 15,
+    )
+    draw_ellipse(
+        frame,
+        (center_x, int(center_y + 0.5 * size)),
+        (int(size * 0.3), int(size * 0.08)),
+        (60, 60, 120),
+    )
+
+
+@pytest.fixture(scope="module")
+def video_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("video") / "faces.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 25, (320, 240))
+    for frame_index in range(FRAME_COUNT):
+        frame = np.full((240, 320, 3), 90, np.uint8)
+        draw_face(frame, 80 + 3 * frame_index, 120, 50)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def read_records(path):
+    with open(path) as handle:
+        records = [json.loads(line) for line in handle]
+    return [record for record in records if "frame_index" in record]
+
+
+def run_records(video_path, output_dir, **options):
+    options = dict(face_model="haar", no_video=True, frame_step=2, **options)
+    stats = run_face_recognition(video_path, output_dir=str(output_dir), **options)
+    return read_records(stats["metadata_path"])
+
+
+def without_track_ids(records):
+    return [
+        {key: value for key, value in record.items() if key != "track_ids"}
+        for record in records
+    ]
+
+
+@pytest.mark.parametrize("face_tracking", [False, True])
+def test_execution_modes_write_identical_records(video_path, tmp_path, face_tracking):
+    serial = run_records(video_path, tmp_path / "serial", face_tracking=face_tracking)
+    threaded = run_records(
+        video_path,
+        tmp_path / "threaded",
+        face_tracking=face_tracking,
+        pipeline_mode="threaded",
+    )
+    segmented = run_records(
+        video_path, tmp_path / "workers", face_tracking=face_tracking, workers=2
+    )
+
+    assert len(serial) == FRAME_COUNT // 2
+    assert sum(record["face_count"] for record in serial) == len(serial)
+    assert threaded == serial
+    assert without_track_ids(segmented) == without_track_ids(serial)
+
+
+def test_resume_matches_uninterrupted_run(video_path, tmp_path, monkeypatch):
+    options = dict(face_tracking=True, detect_interval=3, checkpoint_interval=5)
+    expected = run_records(video_path, tmp_path / "full", **options)
+
+    detect_faces = stages.detect_faces
+    calls = {"count": 0}
+
+    def crashing_detect_faces(*args, **kwargs):
+        calls["count"] += 1
+        if calls["count"] == 6:
+            raise RuntimeError("interrupted")
+        return detect_faces(*args, **kwargs)
+
+    monkeypatch.setattr(stages, "detect_faces", crashing_detect_faces)
+    with pytest.raises(RuntimeError, match="interrupted"):
+        run_records(video_path, tmp_path / "resumed", **options)
+    monkeypatch.setattr(stages, "detect_faces", detect_faces)
+    resumed = run_records(video_path, tmp_path / "resumed", resume=True, **options)
+
+    assert resumed == expected
+
+
+def drawn_boxes(video_path, **options):
+    options = resolve_options(
+        dict(
+            stages=("faces", "annotate"),
+            face_model="haar",
+            frame_step=3,
+            summary_only=False,
+            **options,
+        )
+    )
+    frames = []
+    records = {}
+
+    def write(frame, record):
+        frames.append(frame)
+        if record is not None:
+            records[record["frame_index"]] = record["boxes"]
+
+    capture = cv2.VideoCapture(video_path)
+    try:
+        analyze_video(capture, capture.get(cv2.CAP_PROP_FPS), write, options)
+    finally:
+        capture.release()
+    boxes = []
+    for frame in frames:
+        ys, xs = np.where((frame == BOX_COLOR).all(axis=2))
+        if not len(ys):
+            boxes.append(None)
+            continue
+        boxes.append(
+            [int(ys.min()) + 1, int(xs.max()) - 1, int(ys.max()) - 1, int(xs.min()) + 1]
+        )
+    return boxes, records
+
+
+def test_carry_annotations_draws_last_boxes_on_skipped_frames(video_path):
+    boxes, records = drawn_boxes(video_path, carry_annotations=True)
+
+    assert len(boxes) == FRAME_COUNT
+    for frame_index, box in enumerate(boxes):
+        assert box == records[frame_index - frame_index % 3][0]
+
+
+def test_interpolate_boxes_without_tracking(video_path):
+    boxes, records = drawn_boxes(video_path, interpolate_boxes=True)
+
+    for frame_index, box in enumerate(boxes[:-3]):
+        start_index = frame_index - frame_index % 3
+        start = records[start_index][0]
+        end = records[start_index + 3][0]
+        ratio = (frame_index - start_index) / 3.0
+        assert box == [int(round(a + (b - a) * ratio)) for a, b in zip(start, end)]
@@ -0,0 +1,19 @@
+from modules.face_tracking_module import interpolate_boxes
+
+
+def test_interpolate_boxes_matches_by_iou_without_track_ids():
+    start = [(10, 50, 50, 10), (100, 160, 160, 100)]
+    end = [(104, 164, 164, 104), (14, 54, 54, 14)]
+
+    expected = [(12, 52, 52, 12), (102, 162, 162, 102)]
+    assert interpolate_boxes(start, end, 0.5) == expected
+    assert interpolate_boxes(start, end, 0.5, [], []) == expected
+
+
+def test_interpolate_boxes_follows_track_ids():
+    start = [(10, 50, 50, 10), (100, 160, 160, 100)]
+    end = [(14, 54, 54, 14), (104, 164, 164, 104)]
+
+    interpolated = interpolate_boxes(start, end, 0.5, [1, 2], [2, 3])
+
+    assert interpolated == [(10, 50, 50, 10), (57, 107, 107, 57)]
@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+
+from utils.metadata_sinks import BOX_KEYS, create_columnar_sink, create_metadata_sink
+
+
+def build_records():
+    records = []
+    for frame_index in range(6):
+        record = {
+            "frame_index": frame_index,
+            "timestamp": frame_index / 25.0,
+            "face_count": frame_index % 2,
+            "boxes": [[10, 50, 50, 10]] * (frame_index % 2),
+            "emotions": ["happy"] * (frame_index % 2),
+            "is_anomaly": False,
+            "timings_ms": {"activity": 1.0},
+        }
+        if frame_index % 2:
+            record["timings_ms"]["faces"] = 2.0
+        if frame_index >= 3:
+            record["anomaly_motion"] = frame_index == 4
+            record["activity"] = "idle"
+            record["track_ids"] = [frame_index] * (frame_index % 2)
+        records.append(record)
+    return records
+
+
+def test_columnar_sink_keeps_one_entry_per_frame(tmp_path):
+    sink = create_metadata_sink(str(tmp_path / "metadata.jsonl"), "npz")
+    records = build_records()
+    for record in records:
+        sink["write"](record)
+    sink["close"]({"frames_processed": len(records)})
+
+    with np.load(sink["path"]) as data:
+        arrays = {key: data[key] for key in data.files}
+    rows = len(arrays["frame_index"])
+    box_count = len(arrays["boxes"])
+    assert rows == len(records)
+    assert len(arrays["box_offsets"]) == rows + 1
+    for key, array in arrays.items():
+        if key in ("boxes", "box_offsets", "summary_json"):
+            continue
+        expected = box_count if key in BOX_KEYS else rows
+        assert len(array) == expected, key
+
+    assert np.isnan(arrays["timing_faces_ms"][0::2]).all()
+    assert (arrays["timing_faces_ms"][1::2] == 2.0).all()
+    assert np.isnan(arrays["anomaly_motion"][:3]).all()
+    assert arrays["anomaly_motion"][4] == 1.0
+    assert list(arrays["activity"][:3]) == ["", "", ""]
+    assert np.isnan(arrays["track_ids"][0])
+    assert arrays["track_ids"][-1] == 5
+    assert arrays["is_anomaly"].dtype == np.bool_
+
+
+def write_columns(path, records, checkpoint_at=None, **options):
+    sink = create_columnar_sink(str(path), **options)
+    for index, record in enumerate(records):
+        sink["write"](record)
+        if index == checkpoint_at:
+            sink["checkpoint"]({"frames_processed": index + 1})
+    sink["close"]({"frames_processed": len(records)})
+    with np.load(sink["path"]) as data:
+        return {key: data[key] for key in data.files}
+
+
+def test_columnar_sink_flushes_parts_and_merges_on_close(tmp_path):
+    records = build_records()
+    records[5].update(face_count=0, boxes=[], emotions=[], track_ids=[])
+    expected = write_columns(tmp_path / "single.npz", records)
+
+    sink = create_columnar_sink(str(tmp_path / "chunked.npz"), chunk_size=2)
+    for record in records[:3]:
+        sink["write"](record)
+    sink["checkpoint"]({"frames_processed": 3})
+    assert len(os.listdir(sink["path"] + ".parts")) == 2
+
+    merged = write_columns(
+        tmp_path / "merged.npz", records, checkpoint_at=2, chunk_size=2
+    )
+
+    assert not os.path.exists(str(tmp_path / "merged.npz") + ".parts")
+    assert sorted(merged) == sorted(expected)
+    for key, array in expected.items():
+        assert merged[key].dtype == array.dtype, key
+        np.testing.assert_array_equal(merged[key], array, err_msg=key)